@@ -0,0 +1,459 @@
+"""
+Benchmarks for PyPong's per-frame hot paths.
+
+Runs headless under SDL's dummy video and audio drivers, with fixed seeds
+and scripted inputs so every run does the same work. For each case it
+reports the time per operation, how much Python memory is allocated on top
+of what is already live while operations run (peak, per operation), how
+many allocated blocks each operation leaves behind and, for whole-frame
+cases, the frames per second that implies. Cases that draw are run both
+with image assets and without them.
+
+    python benchmarks/bench_pong.py              # Run and print results.
+    python benchmarks/bench_pong.py --check      # Also fail on regressions.
+    python benchmarks/bench_pong.py --save       # Store results as the new baseline.
+
+Absolute timings depend on the machine, so every case is timed alongside
+a fixed calibration op that no change to PyPong touches, and its time is
+stored relative to that. --check compares those ratios against
+benchmarks/baseline.json and exits with status 1 if any case is slower
+than the baseline by more than --tolerance. Cases dominated by threads,
+disk or the mixer (UNGATED) are reported but never fail the check.
+
+The ratios still shift somewhat between machines. To gate a particular
+machine tightly, record its own baseline there first with --save, from a
+tree known to be good, and run --check against that.
+"""
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # Assets are loaded relative to the working directory.
+
+import pygame
+import pong
+import pong_core
+
+SEED = 1234
+DEFAULT_TOLERANCE = 0.50   # Allowed slowdown over the baseline before --check fails.
+# Timed and reported, but too noisy to gate: thread start-up, file loading
+# and the mixer.
+UNGATED = {"app.init", "app.init+load", "play_sound/rate-limited", "play_sound/unlimited"}
+
+# --------------- Scripted Inputs ---------------
+def key_script(length=240):
+    """
+    A repeatable sequence of pygame key states: holds up, rests, holds down.
+    """
+    idle = [False] * 512
+    up = list(idle)
+    up[pygame.K_w] = True
+    down = list(idle)
+    down[pygame.K_s] = True
+    rng = pong_core.Rng(SEED)
+    script = []
+    while len(script) < length:
+        keys = (up, idle, down)[int(rng.random() * 3)]
+        script.extend([keys] * (1 + int(rng.random() * 30)))
+    return script[:length]
+
+def mouse_script(buttons, length=240):
+    """
+    Mouse positions that move on and off the given buttons, never clicking.
+    """
+    positions = [button.pos for button in buttons] + [(20, 20), (pong.WIDTH - 20, pong.HEIGHT - 20)]
+    return [positions[(i // 20) % len(positions)] for i in range(length)]
+
+def make_skin(size, color):
+    surf = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+    surf.fill(color)
+    return surf
+
+def strip_assets(app):
+    """
+    Turns a loaded App into one that draws without any image assets.
+    """
+    app.background_image = None
+    app.title_image = None
+    app.title_pulse = None
+    app.paddle_image = None
+    app.ball_image = None
+    app.button_image = None
+    for button in app.menu_scene.buttons.values():
+        button.image = None
+        button.skin = None
+    app.menu_layer = app.build_layer(pong.DARKGRAY)
+    app.game_layer = app.build_layer(pong.BLACK, field=True)
+
+cleanups = []    # Called, last first, once the current case is measured.
+
+def make_app(assets, backend=pong.BACKEND_SURFACE):
+    app = pong.App(backend=backend, accelerated=0)
+    app.finish_loading()
+    cleanups.append(app.close)
+    if assets:
+        skin = make_skin((64, 64), pong.ACCENT)
+        app.paddle_image = app.ball_image = app.button_image = skin
+        for button in app.menu_scene.buttons.values():
+            button.image = skin
+            button.skin = pong.ScaledImage(skin)
+    else:
+        strip_assets(app)
+    return app
+
+def run_cleanups():
+    while cleanups:
+        cleanups.pop()()
+
+def swap_global(name, value):
+    """
+    Sets pong.<name> for the current case; the old value is put back by
+    its cleanup.
+    """
+    saved = getattr(pong, name)
+    cleanups.append(lambda: setattr(pong, name, saved))
+    setattr(pong, name, value)
+
+# --------------- Calibration ---------------
+def calibration_op():
+    """
+    Returns an op doing fixed work in the interpreter and in pygame's C
+    code, independent of PyPong, that every case is measured against.
+    """
+    data = [(i * 7919) % 1009 for i in range(1000)]
+    source = pygame.Surface((64, 64))
+    target = pygame.Surface((256, 256))
+    def op():
+        total = 0
+        for value in data:
+            total += value * value % 7
+        sorted(data)
+        for i in range(16):
+            target.blit(source, (i * 12, i * 12))
+    return op
+
+# --------------- Cases ---------------
+# Each case builder returns (op, ops_per_call, is_frame) or (op,
+# ops_per_call, is_frame, setup): op() runs one batch of ops_per_call
+# operations, is_frame marks whole-frame cases that get an FPS figure and
+# setup(), if given, runs untimed before every op() call.
+def case_core_step():
+    game = pong_core.GameCore(seed=SEED)
+    inputs = [pong_core.INPUT_UP, 0, pong_core.INPUT_DOWN, 0] * 60
+    def op():
+        for player_input in inputs:
+            game.step(player_input)
+    return op, len(inputs), False
+
+def case_rewind_push():
+    game = pong_core.GameCore(seed=SEED)
+    rewind = pong_core.RewindBuffer(300)
+    def op():
+        for _ in range(240):
+            rewind.push(game)
+    return op, 240, False
+
+def case_rewind_restore():
+    game = pong_core.GameCore(seed=SEED)
+    rewind = pong_core.RewindBuffer(300)
+    for _ in range(300):
+        rewind.push(game)
+        game.step(0)
+    def op():
+        for _ in range(240):
+            rewind.rewind(game)
+        rewind.count += 240    # Make the same snapshots available again.
+        rewind.head = (rewind.head + 240) % rewind.capacity
+    return op, 240, False
+
+def case_game_update():
+    game = pong.PongGame(sound_on=False, seed=SEED)
+    script = key_script()
+    def op():
+        for keys in script:
+            game.update(keys)
+    return op, len(script), False
+
+def case_game_draw(assets):
+    def build():
+        app = make_app(assets)
+        game = pong.PongGame(sound_on=False, paddle_img=app.paddle_image, ball_img=app.ball_image, seed=SEED)
+        script = key_script()
+        for keys in script[:30]:
+            game.update(keys)
+        def op():
+            for _ in range(60):
+                app.canvas.blit(app.game_layer, (0, 0))
+                game.draw(app.canvas, field=False)
+        return op, 60, False
+    return build
+
+def case_game_frame(assets, backend=pong.BACKEND_SURFACE):
+    def build():
+        app = make_app(assets, backend)
+        game = pong.PongGame(sound_on=False, paddle_img=app.paddle_image, ball_img=app.ball_image, seed=SEED)
+        script = key_script()
+        canvas = app.canvas
+        canvas.set_background(app.game_layer)
+        def op():
+            for keys in script[:60]:
+                game.update(keys)
+                canvas.begin()
+                canvas.present(game.draw(canvas, field=False))
+        return op, 60, True
+    return build
+
+def case_button(assets):
+    def build():
+        app = make_app(assets)
+        buttons = list(app.menu_scene.buttons.values())
+        script = mouse_script(buttons)
+        def op():
+            for mouse_pos in script:
+                for button in buttons:
+                    button.update(mouse_pos)
+                    button.draw(app.canvas)
+        return op, len(script) * len(buttons), False
+    return build
+
+def case_menu_frame(assets):
+    def build():
+        app = make_app(assets)
+        script = mouse_script(list(app.menu_scene.buttons.values()))
+        app.switch_scene(app.menu_scene)
+        def setup():
+            app.menu_scene.time = 0.0    # Every op draws the same title frames.
+        def op():
+            for mouse_pos in script[:60]:
+                app.mouse_pos = mouse_pos
+                app.update_scenes(1.0 / 60)
+                app.draw_scenes()
+        return op, 60, True, setup
+    return build
+
+def case_particles():
+    # A score explosion every frame keeps the system at its cap.
+    def build():
+        app = make_app(False)
+        particles = app.particles
+        def op():
+            for _ in range(60):
+                particles.explosion(pong.WIDTH // 2, pong.HEIGHT // 2, 0.0)
+                particles.update(1.0 / 60)
+                particles.draw(app.canvas)
+        return op, 60, True
+    return build
+
+def case_play_sound(min_interval):
+    def build():
+        swap_global("sound_bank", pong.SoundBank(min_interval=min_interval))
+        pong.sound_bank.preload()
+        def op():
+            for _ in range(100):
+                pong.play_sound("ball_hit.mp3")
+        return op, 100, False
+    return build
+
+def fresh_assets():
+    # Stops the last op's loader thread, so it does not run into the next
+    # op, and gives the next op an empty AssetManager.
+    pong.assets.close()
+    pong.assets = pong.AssetManager()
+
+def case_app_init():
+    # Time to the first frame: assets keep loading in the background.
+    swap_global("assets", pong.AssetManager())
+    cleanups.append(lambda: pong.assets.close())
+    def op():
+        pong.App().close()
+    return op, 1, False, fresh_assets
+
+def case_app_load():
+    # Time until every menu and game asset is loaded and applied.
+    swap_global("assets", pong.AssetManager())
+    cleanups.append(lambda: pong.assets.close())
+    def op():
+        app = pong.App()
+        app.finish_loading()
+        app.close()
+    return op, 1, False, fresh_assets
+
+CASES = [
+    ("core.step", case_core_step),
+    ("rewind.push", case_rewind_push),
+    ("rewind.restore", case_rewind_restore),
+    ("game.update", case_game_update),
+    ("game.draw/assets", case_game_draw(True)),
+    ("game.draw/plain", case_game_draw(False)),
+    ("game.frame/assets", case_game_frame(True)),
+    ("game.frame/plain", case_game_frame(False)),
+    ("game.frame/texture", case_game_frame(True, pong.BACKEND_TEXTURE)),
+    ("button.update+draw/assets", case_button(True)),
+    ("button.update+draw/plain", case_button(False)),
+    ("menu.frame/assets", case_menu_frame(True)),
+    ("menu.frame/plain", case_menu_frame(False)),
+    ("particles.frame", case_particles()),
+    ("play_sound/rate-limited", case_play_sound(pong.SFX_MIN_INTERVAL_MS)),
+    ("play_sound/unlimited", case_play_sound(0)),
+    ("app.init", case_app_init),
+    ("app.init+load", case_app_load),
+]
+
+# --------------- Measurement ---------------
+def timed(op):
+    gc.disable()
+    t0 = time.perf_counter_ns()
+    op()
+    elapsed = time.perf_counter_ns() - t0
+    gc.enable()
+    return elapsed
+
+def time_case(op, ops_per_call, min_time, setup=None, calibrate=None):
+    """
+    Returns (best ns/op, best ns per calibrate() call) over repeated calls
+    lasting at least min_time. The two are interleaved so that both see the
+    machine in the same state.
+    """
+    if setup:
+        setup()
+    op()  # Warm caches.
+    best = best_calibration = None
+    calls = 0
+    start = time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < min_time:
+        if calibrate:
+            elapsed = timed(calibrate)
+            if best_calibration is None or elapsed < best_calibration:
+                best_calibration = elapsed
+        if setup:
+            setup()
+        elapsed = timed(op)
+        calls += 1
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / ops_per_call, best_calibration
+
+def memory_case(op, ops_per_call, setup=None):
+    """
+    Returns (bytes, blocks) per operation: the peak Python memory allocated
+    on top of what was live before a call, and the blocks still alive after it.
+    """
+    if setup:
+        setup()
+    op()
+    if setup:
+        setup()
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if setup:
+        setup()    # Compare like with like: both counts follow a setup().
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks
+    return (peak - current) / ops_per_call, retained / ops_per_call
+
+def run(selected=None, min_time=0.5):
+    results = {}
+    calibrate = calibration_op()
+    for name, build in CASES:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        try:
+            op, ops_per_call, is_frame, *setup = build()
+            setup = setup[0] if setup else None
+            ns, calibration_ns = time_case(op, ops_per_call, min_time, setup, calibrate)
+            alloc_bytes, blocks = memory_case(op, ops_per_call, setup)
+        finally:
+            run_cleanups()
+        results[name] = {
+            "ns_per_op": round(ns, 1),
+            "relative": round(ns / calibration_ns, 5),
+            "peak_alloc_bytes_per_op": round(alloc_bytes, 1),
+            "retained_blocks_per_op": round(blocks, 3),
+            "fps": round(1e9 / ns, 1) if is_frame else None,
+        }
+        row = results[name]
+        fps = f"{row['fps']:>10.1f}" if row["fps"] else f"{'':>10}"
+        print(f"{name:<28}{ns:>14,.0f} ns/op{row['relative']:>10.3f} x cal{alloc_bytes:>10,.0f} peak B/op{blocks:>9.2f} blk/op{fps} fps", flush=True)
+    return results
+
+def check(results, baseline, tolerance):
+    """
+    Returns (failures, warnings): the gated and the UNGATED cases whose
+    time relative to the calibration op grew past the tolerance.
+    """
+    failures = []
+    warnings = []
+    for name, row in results.items():
+        base = baseline.get(name)
+        if base is None or "relative" not in base:
+            continue
+        limit = base["relative"] * (1 + tolerance)
+        if row["relative"] > limit:
+            message = f"{name}: {row['relative']:.3f} x cal > {limit:.3f} (baseline {base['relative']:.3f})"
+            (warnings if name in UNGATED else failures).append(message)
+    return failures, warnings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cases", nargs="*", help="Only run cases whose name contains one of these.")
+    parser.add_argument("--check", action="store_true", help="Fail if a case regressed past the baseline.")
+    parser.add_argument("--save", action="store_true", help="Store these results as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, as a fraction.")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend timing each case.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    app = pong.App()    # Opens the dummy display so surfaces can be converted.
+    app.finish_loading()
+    app.close()
+    results = run(args.cases, args.min_time)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save:
+        baseline = {}
+        if os.path.exists(BASELINE_FILENAME):
+            with open(BASELINE_FILENAME) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(BASELINE_FILENAME, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {BASELINE_FILENAME}")
+    if args.check:
+        if not os.path.exists(BASELINE_FILENAME):
+            print("No baseline to check against; run with --save first.")
+            return 1
+        with open(BASELINE_FILENAME) as f:
+            failures, warnings = check(results, json.load(f), args.tolerance)
+        if warnings:
+            print("Slower, but not gated:")
+            for warning in warnings:
+                print("  " + warning)
+        if failures:
+            print("Regressions:")
+            for failure in failures:
+                print("  " + failure)
+            return 1
+        print("No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
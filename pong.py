@@ -1,8 +1,35 @@
 import pygame
 import sys
+import argparse
+import asyncio
 import math
-import random
 import os
+import time
+import json
+import queue
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+
+import pong_core
+import pong_replay
+import pong_net
+
+try:
+    from PIL import Image   # Optional: decodes the frames of animated backgrounds.
+except ImportError:
+    Image = None
+
+try:
+    from pygame._sdl2 import video    # Optional: the Renderer/Texture backend.
+except ImportError:
+    video = None
+
+try:
+    import numpy as np      # Optional: particle effects.
+except ImportError:
+    np = None
 
 # Initialize Pygame and its mixer.
 pygame.init()
@@ -10,7 +37,9 @@ pygame.mixer.init()
 
 # --------------- Global Variables and Constants ---------------
 WIDTH, HEIGHT = 800, 600
-FPS = 60
+FPS = 60                             # Frame rate cap; 0 leaves the frame rate uncapped.
+TICK_RATE = pong_core.TICK_RATE      # Simulation ticks per second, independent of FPS.
+MAX_CATCHUP_TICKS = 5                # Most ticks simulated in one frame before dropping time.
 
 # Colors.
 WHITE      = (255, 255, 255)
@@ -18,6 +47,7 @@ BLACK      = (0, 0, 0)
 DARKGRAY   = (40, 40, 40)
 LIGHTGRAY  = (200, 200, 200)
 ACCENT     = (30, 144, 255)
+COLORKEY   = (255, 0, 255)    # Transparent pixels of colorkeyed sprites.
 
 # Game states.
 STATE_MENU   = "menu"
@@ -25,6 +55,52 @@ STATE_GAME   = "game"
 STATE_PAUSE  = "pause"
 STATE_WIN    = "win"
 STATE_LOSE   = "lose"
+STATE_REPLAY = "replay"
+STATE_ONLINE = "online"
+
+# Render modes.
+RENDER_FULL  = "full"     # Redraw the whole screen and flip every frame.
+RENDER_DIRTY = "dirty"    # Redraw and update only the regions that changed.
+RENDER_MODE  = RENDER_DIRTY
+
+# Render backends.
+BACKEND_SURFACE = "surface"    # Software Surface blits onto a WIDTH x HEIGHT window.
+BACKEND_TEXTURE = "texture"    # pygame._sdl2.video Renderer and cached Textures, scaled to the window.
+RENDER_BACKEND  = BACKEND_SURFACE
+WINDOW_SIZE     = (WIDTH, HEIGHT)    # Initial window size of the texture backend.
+
+# Frame profiler.
+PROFILE_ENABLED = False                 # Record frame timings from startup.
+PROFILE_CAPACITY = 1024                 # Frames kept in the profiler's ring buffer.
+PROFILE_EXPORT_FILENAME = "frame_profile.csv"   # Written on exit; ".json" also works.
+PROFILE_OVERLAY_KEY = pygame.K_F3       # Toggles the on-screen overlay (and recording).
+
+# Animated background.
+ANIMATED_BACKGROUND = True      # Play every frame of the background GIF (needs Pillow).
+BACKGROUND_RING_FRAMES = 4      # Decoded frames buffered ahead of the one on screen.
+BACKGROUND_MAX_LAG_MS = 250     # Further behind than this, the animation resyncs instead of skipping ahead.
+GIF_DEFAULT_DELAY_MS = 100      # Delay for frames that don't specify one, as browsers do.
+GIF_MIN_DELAY_MS = 20
+BACKGROUND_FRAME_MS = 100       # Shortest time a frame is shown; each new one redraws the whole screen.
+
+# Replays.
+RECORD_REPLAYS = True                      # Record every match.
+REPLAY_FILENAME = "last_match.pongreplay"  # Where the last match is saved when it ends.
+REPLAY_SEEK_SECONDS = 5                    # Left/Right arrow seek distance during playback.
+
+# Particles.
+PARTICLES_ENABLED = True          # Hit sparks, ball trail and score explosions (needs NumPy).
+MAX_PARTICLES = 2048              # Hard cap on live particles; emissions past it are dropped.
+PARTICLE_FADE_LEVELS = 8          # Pre-rendered fade steps per particle kind.
+PARTICLE_DRAG = 3.0               # Velocity decay rate, per second.
+PARTICLE_MIN_QUALITY = 0.1        # Emission is never scaled below this fraction.
+
+# Practice mode.
+REWIND_SECONDS = 5           # How far back a practice match can be rewound.
+REWIND_KEY = pygame.K_r      # Held to rewind, one tick per tick.
+
+# Score popup.
+POPUP_SECONDS = 1.5    # How long "You Win!" / "You Lose!" stays over the game after a point.
 
 # Global variables for background music.
 current_bg_track = None
@@ -38,24 +114,263 @@ PADDLE_FILENAME     = "paddle.png"
 BALL_FILENAME       = "ball.png"
 BUTTON_FILENAME     = "button.png"
 
+# Images that are scaled once when they are loaded.
+IMAGE_SIZES = {
+    BACKGROUND_FILENAME: (WIDTH, HEIGHT),
+}
+
+# Assets each scene needs before it is shown, and the scene that usually
+# comes next, whose assets are fetched while the current one runs.
+SCENE_IMAGES = {
+    STATE_MENU: (BACKGROUND_FILENAME, TITLE_FILENAME, BUTTON_FILENAME),
+    STATE_GAME: (PADDLE_FILENAME, BALL_FILENAME),
+}
+NEXT_SCENE = {
+    STATE_MENU: STATE_GAME,
+    STATE_GAME: STATE_MENU,
+    STATE_PAUSE: STATE_MENU,
+    STATE_WIN: STATE_MENU,
+    STATE_LOSE: STATE_MENU,
+    STATE_REPLAY: STATE_MENU,
+    STATE_ONLINE: STATE_MENU,
+}
+
+# --------------- Sound Effects ---------------
+# Every effect the game can trigger. These are decoded once by the sound bank
+# so that playing them during a rally never touches the disk or the codec.
+SOUND_EFFECTS = (
+    "ball_hit.mp3",
+    "score.mp3",
+    "boom_win.mp3",
+    "boom_lose.mp3",
+    "button_press.mp3",
+)
+SFX_CHANNELS        = 6     # Mixer channels reserved for sound effects.
+SFX_MIN_INTERVAL_MS = 40    # Minimum gap between two plays of the same effect.
+
+# --------------- Asset Manager ---------------
+def decode_image(filename, size=None):
+    """
+    Loads and scales an image without converting it, so it can run off the
+    main thread. Returns None if the file is missing or broken.
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        img = pygame.image.load(filename)
+        if size:
+            img = pygame.transform.scale(img, size)
+        return img
+    except Exception as e:
+        print(f"[ASSETS] Error loading {filename}: {e}")
+        return None
+
+class AssetManager:
+    """
+    Loads assets on a worker thread.
+    Requests are queued with a key and a loader function; the worker runs
+    them in order and stores the results. The main thread polls with done()
+    and get(), so nothing it does ever waits on the disk or a decoder, and
+    images are converted to the display format on the main thread the first
+    time they are fetched. Missing assets load as None.
+    """
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.results = {}
+        self.requested = set()
+        self.converted = {}
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._work, name="asset-loader", daemon=True)
+            self.thread.start()
+
+    def close(self):
+        """
+        Stops the worker thread and waits for it to exit. Requests it has not
+        started are dropped; only the one in progress is finished.
+        """
+        if self.thread is not None:
+            while True:
+                try:
+                    self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            key, loader, args = job
+            try:
+                result = loader(*args)
+            except Exception as e:
+                print(f"[ASSETS] Error loading {key}: {e}")
+                result = None
+            self.results[key] = result
+
+    def request(self, key, loader, *args):
+        if key not in self.requested:
+            self.requested.add(key)
+            self.start()
+            self.jobs.put((key, loader, args))
+        return key
+
+    def request_image(self, filename):
+        return self.request(("image", filename), decode_image, filename, IMAGE_SIZES.get(filename))
+
+    def request_sound(self, name):
+        return self.request(("sound", name), sound_bank.load, name)
+
+    def prefetch_scene(self, state):
+        """
+        Queues everything the given scene needs. Returns the keys.
+        """
+        return [self.request_image(filename) for filename in SCENE_IMAGES.get(state, ())]
+
+    def done(self, key):
+        return key in self.results
+
+    def progress(self, keys):
+        if not keys:
+            return 1.0
+        return sum(1 for key in keys if key in self.results) / len(keys)
+
+    def wait(self, keys, timeout=None):
+        """
+        Blocks until the given assets are loaded. Only meant for tools and
+        benchmarks; the game itself polls.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not all(key in self.results for key in keys):
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def image(self, filename):
+        """
+        Returns the loaded image converted to the display format, or None if
+        it is missing or not loaded yet (in which case it is requested).
+        """
+        key = self.request_image(filename)
+        if key in self.converted:
+            return self.converted[key]
+        if key not in self.results:
+            return None
+        img = self.results[key]
+        if img is not None:
+            img = img.convert_alpha()
+        self.converted[key] = img
+        return img
+
+assets = AssetManager()
+
 # --------------- Audio Helper Functions ---------------
+class SoundBank:
+    """
+    Keeps decoded sound effects in memory and plays them through a fixed pool
+    of reserved mixer channels.
+    Each effect is decoded at most once (missing or broken files are
+    remembered as such), repeated triggers of the same effect closer together
+    than `min_interval` milliseconds are dropped, and when every channel is
+    busy the voice that started playing first is stolen.
+    """
+    def __init__(self, num_channels=SFX_CHANNELS, min_interval=SFX_MIN_INTERVAL_MS):
+        self.num_channels = num_channels
+        self.min_interval = min_interval
+        self.sounds = {}        # name -> Sound, or None if it could not be loaded.
+        self.last_played = {}   # name -> tick of the last accepted play.
+        self.channels = []
+        self.channel_started = []
+
+    def _init_channels(self):
+        if self.channels or not pygame.mixer.get_init():
+            return
+        if pygame.mixer.get_num_channels() < self.num_channels:
+            pygame.mixer.set_num_channels(self.num_channels)
+        pygame.mixer.set_reserved(self.num_channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.num_channels)]
+        self.channel_started = [0] * self.num_channels
+
+    def load(self, name):
+        """
+        Returns the decoded Sound for name, decoding it on first use.
+        Returns None if the file is missing or cannot be decoded.
+        """
+        if name in self.sounds:
+            return self.sounds[name]
+        sound = None
+        if os.path.exists(name) and pygame.mixer.get_init():
+            try:
+                sound = pygame.mixer.Sound(name)
+            except Exception as e:
+                print(f"[SOUND] Error loading sound {name}: {e}")
+        self.sounds[name] = sound
+        return sound
+
+    def preload(self, names=SOUND_EFFECTS):
+        self._init_channels()
+        for name in names:
+            self.load(name)
+
+    def _pick_channel(self):
+        oldest = 0
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return i
+            if self.channel_started[i] < self.channel_started[oldest]:
+                oldest = i
+        return oldest
+
+    def play(self, name, volume=0.7):
+        """
+        Plays name if it is decoded. An effect the asset manager has not
+        decoded yet is skipped rather than decoded here on the main thread.
+        """
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        now = pygame.time.get_ticks()
+        last = self.last_played.get(name)
+        if last is not None and now - last < self.min_interval:
+            return
+        self._init_channels()
+        if not self.channels:
+            return
+        index = self._pick_channel()
+        channel = self.channels[index]
+        channel.stop()
+        channel.set_volume(volume)
+        channel.play(sound)
+        self.channel_started[index] = now
+        self.last_played[name] = now
+
+sound_bank = SoundBank()
+
 def play_sound(name, volume=0.7):
     """
-    Plays a sound effect via a mixer Sound object.
+    Plays a sound effect from the preloaded sound bank.
     The volume is normalized (default is 70%).
     """
-    try:
-        sound = pygame.mixer.Sound(name)
-        sound.set_volume(volume)
-        sound.play()
-    except Exception as e:
-        print(f"[SOUND] Error playing sound {name}: {e}")
+    if profiler.enabled:
+        start = time.perf_counter()
+        sound_bank.play(name, volume)
+        profiler.add(PHASE_AUDIO, time.perf_counter() - start)
+    else:
+        sound_bank.play(name, volume)
 
 def play_background_music(track_name, volume=0.3):
     """
-    Loads and plays background music on a loop.
+    Plays background music on a loop.
     The volume is normalized (default is 30%).
     If the requested track is already loaded and paused, simply unpause it.
+    Tracks stream from their file, which SDL reads as it plays.
     """
     global current_bg_track, MUSIC_PAUSED
     if current_bg_track == track_name:
@@ -68,12 +383,15 @@ def play_background_music(track_name, volume=0.3):
             pygame.mixer.music.stop()
         current_bg_track = track_name
         MUSIC_PAUSED = False
+        start = time.perf_counter()
         try:
             pygame.mixer.music.load(track_name)
             pygame.mixer.music.set_volume(volume)
             pygame.mixer.music.play(-1)
         except Exception as e:
             print(f"[MUSIC] Error loading music {track_name}: {e}")
+        if profiler.enabled:
+            profiler.add(PHASE_AUDIO, time.perf_counter() - start)
 
 def stop_background_music():
     """
@@ -84,6 +402,762 @@ def stop_background_music():
     MUSIC_PAUSED = False
     pygame.mixer.music.stop()
 
+# --------------- Frame Profiler ---------------
+# Columns recorded per frame. PHASE_FRAME is the time from the start of one
+# frame to the start of the next; the others are the work done in each phase.
+# Audio time is spent inside the other phases and also counted there.
+PHASE_FRAME   = 0
+PHASE_EVENTS  = 1
+PHASE_UPDATE  = 2
+PHASE_DRAW    = 3
+PHASE_PRESENT = 4
+PHASE_AUDIO   = 5
+PHASE_NAMES = ("frame", "events", "update", "draw", "present", "audio")
+
+class FrameProfiler:
+    """
+    Records per-phase frame timings into a preallocated ring buffer.
+    A loop calls begin_frame() once per frame and mark(phase) after each
+    phase; each mark charges the time since the previous mark to that phase.
+    While disabled, every call returns straight away.
+    """
+    def __init__(self, capacity=PROFILE_CAPACITY, enabled=False):
+        self.capacity = capacity
+        self.columns = len(PHASE_NAMES)
+        self.samples = array("d", bytes(8 * capacity * self.columns))
+        self.count = 0          # Frames recorded in total.
+        self.row = 0            # Offset of the frame being recorded.
+        self.enabled = enabled
+        self.overlay = False
+        self.overlay_enabled = False    # Recording was started by the overlay.
+        self.frame_start = None
+        self.last_mark = 0.0
+        self.overlay_text = []
+        self.overlay_updated = 0.0
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.samples[self.row + PHASE_FRAME] = now - self.frame_start
+            self.count += 1
+            self.row = (self.count % self.capacity) * self.columns
+            for i in range(self.columns):
+                self.samples[self.row + i] = 0.0
+        self.frame_start = self.last_mark = now
+
+    def mark(self, phase):
+        if not self.enabled or self.frame_start is None:
+            return
+        now = time.perf_counter()
+        self.samples[self.row + phase] += now - self.last_mark
+        self.last_mark = now
+
+    def add(self, phase, seconds):
+        if self.enabled:
+            self.samples[self.row + phase] += seconds
+
+    def toggle_overlay(self):
+        """
+        Shows or hides the overlay. Showing it starts recording if it was
+        off; hiding it stops recording again if the overlay started it.
+        """
+        self.overlay = not self.overlay
+        if self.overlay and not self.enabled:
+            self.enabled = True
+            self.overlay_enabled = True
+            self.frame_start = None
+        elif not self.overlay and self.overlay_enabled:
+            self.enabled = False
+            self.overlay_enabled = False
+
+    def frames(self):
+        """
+        Returns the recorded frames, oldest first, as tuples of seconds.
+        """
+        kept = min(self.count, self.capacity - 1)    # One slot holds the frame in progress.
+        first = self.count - kept
+        columns = self.columns
+        rows = []
+        for frame in range(first, self.count):
+            offset = (frame % self.capacity) * columns
+            rows.append(tuple(self.samples[offset:offset + columns]))
+        return rows
+
+    def summary(self):
+        """
+        Returns FPS, frame-time percentiles and mean phase times (in ms) for
+        the frames in the buffer, or None if nothing has been recorded.
+        """
+        rows = self.frames()
+        if not rows:
+            return None
+        frame_times = sorted(row[PHASE_FRAME] for row in rows)
+        def percentile(p):
+            return 1000 * frame_times[min(len(frame_times) - 1, int(p / 100 * len(frame_times)))]
+        mean_frame = sum(frame_times) / len(frame_times)
+        return {
+            "fps": 1 / mean_frame if mean_frame else 0.0,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": 1000 * frame_times[-1],
+            "phases": {name: 1000 * sum(row[i] for row in rows) / len(rows)
+                       for i, name in enumerate(PHASE_NAMES) if i != PHASE_FRAME},
+        }
+
+    def draw_overlay(self, canvas):
+        """
+        Draws the FPS and frame-time overlay in the top-left corner and
+        returns its rect. The text is refreshed twice a second.
+        """
+        now = time.perf_counter()
+        if now - self.overlay_updated > 0.5:
+            self.overlay_updated = now
+            stats = self.summary()
+            if stats is None:
+                self.overlay_text = ["Profiling..."]
+            else:
+                phases = "  ".join(f"{name} {ms:.2f}" for name, ms in stats["phases"].items())
+                self.overlay_text = [
+                    f"FPS {stats['fps']:.1f}   frame p50 {stats['p50']:.1f}  p95 {stats['p95']:.1f}  p99 {stats['p99']:.1f}  max {stats['max']:.1f} ms",
+                    f"{phases} ms",
+                ]
+        surfs = [text_cache.render(line, 16, WHITE) for line in self.overlay_text]
+        area = pygame.Rect(4, 4, max(surf.get_width() for surf in surfs) + 8, sum(surf.get_height() for surf in surfs) + 8)
+        canvas.fill_rect(BLACK, area)
+        y = area.top + 4
+        for surf in surfs:
+            canvas.blit(surf, (area.left + 4, y))
+            y += surf.get_height()
+        return area
+
+    def export(self, filename):
+        """
+        Writes the recorded frames (in milliseconds) to a CSV file, or to a
+        JSON file if filename ends in ".json".
+        """
+        rows = [[round(1000 * value, 4) for value in row] for row in self.frames()]
+        if not rows:
+            return
+        try:
+            with open(filename, "w", newline="") as f:
+                if filename.endswith(".json"):
+                    json.dump({"columns_ms": PHASE_NAMES, "frames": rows, "summary": self.summary()}, f)
+                else:
+                    f.write(",".join(f"{name}_ms" for name in PHASE_NAMES) + "\n")
+                    for row in rows:
+                        f.write(",".join(str(value) for value in row) + "\n")
+        except OSError as e:
+            print(f"[PROFILE] Error writing {filename}: {e}")
+
+profiler = FrameProfiler()
+
+# --------------- Surface Caches ---------------
+FONT_SIZE_STEP    = 2                  # Animated font sizes are rounded to multiples of this.
+TEXT_CACHE_BYTES  = 8 * 1024 * 1024    # Memory cap for cached rendered text.
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024   # Memory cap for cached scaled images.
+TITLE_PULSE_FRAMES = 48                # Precomputed frames in one title pulse cycle.
+
+def quantize_size(size, step=FONT_SIZE_STEP):
+    """
+    Rounds an animated font size to the nearest step so that a pulsing or
+    scaling label only ever uses a handful of distinct sizes.
+    """
+    return max(step, int(round(size / step)) * step)
+
+def surface_bytes(surf):
+    return surf.get_pitch() * surf.get_height()
+
+class SurfaceCache:
+    """
+    A least-recently-used map of surfaces with a cap on their total size.
+    on_evict, if given, is called with the key of every entry evicted.
+    """
+    def __init__(self, max_bytes, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def get(self, key):
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+        return surf
+
+    def put(self, key, surf):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= surface_bytes(old)
+        self.entries[key] = surf
+        self.total_bytes += surface_bytes(surf)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            old_key, old = self.entries.popitem(last=False)
+            self.total_bytes -= surface_bytes(old)
+            if self.on_evict is not None:
+                self.on_evict(old_key)
+        return surf
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+class TextCache:
+    """
+    Caches fonts per (family, size) and rendered text surfaces per
+    (family, size, text, color).
+    Rendered surfaces are evicted least-recently-used first once their total
+    size exceeds max_bytes. Fonts are few and small, so they are kept forever.
+    """
+    def __init__(self, max_bytes=TEXT_CACHE_BYTES):
+        self.fonts = {}
+        self.surfaces = SurfaceCache(max_bytes)
+
+    def font(self, family, size):
+        key = (family, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(family, size)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, size, color, family="Arial"):
+        key = (family, size, text, color)
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = self.surfaces.put(key, self.font(family, size).render(text, True, color))
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+
+class ImageCache:
+    """
+    Caches scaled copies of source images per (image, size).
+    A source image is referenced for as long as any of its entries is
+    cached, so the id() in the key cannot be reused by another surface
+    meanwhile, and is let go with its last entry.
+    """
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.surfaces = SurfaceCache(max_bytes, on_evict=self._evicted)
+        self.sources = {}   # id(image) -> [image, number of cached entries]
+
+    def scaled(self, image, size):
+        key = (id(image), size)
+        surf = self.surfaces.get(key)
+        if surf is None:
+            surf = pygame.transform.scale(image, size)
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert_alpha()
+            source = self.sources.get(id(image))
+            if source is None:
+                source = self.sources[id(image)] = [image, 0]
+            source[1] += 1
+            self.surfaces.put(key, surf)
+        return surf
+
+    def _evicted(self, key):
+        source = self.sources[key[0]]
+        source[1] -= 1
+        if not source[1]:
+            del self.sources[key[0]]
+
+    def clear(self):
+        self.surfaces.clear()
+        self.sources.clear()
+
+text_cache = TextCache()
+image_cache = ImageCache()
+
+class ScaledImage:
+    """
+    The scaled copy of one image as drawn by one object.
+    Holds on to the current surface and only goes back to the image cache
+    when the requested size changes.
+    """
+    def __init__(self, image):
+        self.image = image
+        self.size = None
+        self.surface = None
+
+    def get(self, size):
+        if size != self.size:
+            self.surface = image_cache.scaled(self.image, size)
+            self.size = size
+        return self.surface
+
+class PulseAnimation:
+    """
+    A ring of precomputed frames of an image pulsing between
+    1 - amplitude and 1 + amplitude of its size, one sine cycle long.
+    """
+    def __init__(self, image, amplitude=0.05, speed=0.002, frames=TITLE_PULSE_FRAMES):
+        self.speed = speed
+        self.frames = []
+        for i in range(frames):
+            scale_factor = 1 + amplitude * math.sin(2 * math.pi * i / frames)
+            size = (int(image.get_width() * scale_factor), int(image.get_height() * scale_factor))
+            self.frames.append(image_cache.scaled(image, size))
+
+    def frame(self, ticks):
+        phase = (ticks * self.speed) / (2 * math.pi)
+        return self.frames[int(phase * len(self.frames)) % len(self.frames)]
+
+# --------------- Animated Background ---------------
+class AnimatedBackground:
+    """
+    Plays an animated GIF as a full-screen background without decoding it
+    all up front.
+    A worker thread decodes frames one at a time into a fixed ring of
+    display-format surfaces and waits whenever every slot is full, so memory
+    stays at ring_size frames however long the animation is. The main thread
+    calls update() once per frame: it never waits for the decoder, keeps the
+    current frame if the next one isn't ready and, when it is running late,
+    skips the frames whose time has already passed.
+    Frames are merged until they add up to min_delay; the ones merged away
+    are never converted or scaled.
+    """
+    def __init__(self, filename, size, ring_size=BACKGROUND_RING_FRAMES, min_delay=BACKGROUND_FRAME_MS):
+        self.filename = filename
+        self.size = size
+        self.min_delay = min_delay
+        self.slots = [pygame.Surface(size).convert() for _ in range(ring_size)]
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for index in range(ring_size):
+            self.free.put(index)
+        self.current = None
+        self.due = None
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._decode, name="background-decoder", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def open(cls, filename, size):
+        """
+        Returns an AnimatedBackground for the file, or None if Pillow is not
+        installed or the file is missing.
+        """
+        if Image is None or not os.path.exists(filename):
+            return None
+        return cls(filename, size)
+
+    def _decode(self):
+        try:
+            img = Image.open(self.filename)
+            if not getattr(img, "is_animated", False):
+                return  # A single frame: the static background already shows it.
+            delay = 0
+            while True:
+                img.seek(0)
+                for frame_index in range(img.n_frames):
+                    if self.closed:
+                        return
+                    if frame_index:
+                        img.seek(frame_index)
+                    delay += max(img.info.get("duration") or GIF_DEFAULT_DELAY_MS, GIF_MIN_DELAY_MS)
+                    if delay < self.min_delay:
+                        continue    # The next frame replaces this one before it is due.
+                    rgb = img.convert("RGB")
+                    frame = pygame.image.frombuffer(rgb.tobytes(), rgb.size, "RGB")
+                    index = self.free.get()  # Waits while the ring is full.
+                    if index is None or self.closed:
+                        return
+                    self.slots[index].blit(pygame.transform.scale(frame, self.size), (0, 0))
+                    self.ready.put((index, delay))
+                    delay = 0
+        except Exception as e:
+            print(f"[BACKGROUND] Error decoding {self.filename}: {e}")
+
+    def update(self, now):
+        """
+        Advances the animation to now (in milliseconds). Returns the frame to
+        show if it changed, otherwise None. The returned surface is only
+        valid until the next call.
+        """
+        if self.due is None:
+            self.due = now
+        frame = None
+        while now >= self.due:
+            try:
+                index, delay = self.ready.get_nowait()
+            except queue.Empty:
+                if now - self.due > BACKGROUND_MAX_LAG_MS:
+                    self.due = now  # The decoder fell behind; carry on from here.
+                break
+            if frame is not None:
+                self.free.put(frame)
+                self.dropped += 1
+            frame = index
+            self.due += delay
+        if frame is None:
+            return None
+        if self.current is not None:
+            self.free.put(self.current)
+        self.current = frame
+        return self.slots[frame]
+
+    def close(self):
+        """
+        Stops the decoder and waits for it to exit.
+        """
+        self.closed = True
+        self.free.put(None)
+        self.thread.join()
+        self.slots = []
+
+# --------------- Particles ---------------
+# Particle kinds: (color, radius). Sprites for each kind are pre-rendered at
+# PARTICLE_FADE_LEVELS steps of transparency and size.
+PARTICLE_SPARK     = 0
+PARTICLE_TRAIL     = 1
+PARTICLE_EXPLOSION = 2
+PARTICLE_KINDS = (
+    ((255, 230, 150), 2),
+    (LIGHTGRAY, 5),
+    (ACCENT, 3),
+)
+
+class ParticleSystem:
+    """
+    Sparks, ball trails and score explosions. Every particle lives in a set
+    of preallocated NumPy arrays (live ones packed at the front), is moved
+    by a few whole-array operations per frame and is drawn from a table of
+    pre-rendered sprites in one Surface.blits() call.
+    At most capacity particles are alive; emissions past that are dropped.
+    Emission is also scaled by quality, which adjust_quality() lowers while
+    frames take longer than budget_ms and raises again once they don't.
+    Without a budget_ms (an uncapped frame rate), the budget is one
+    simulation tick.
+    """
+    def __init__(self, capacity=MAX_PARTICLES, budget_ms=None, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.x = np.zeros(capacity, np.float32)
+        self.y = np.zeros(capacity, np.float32)
+        self.vx = np.zeros(capacity, np.float32)
+        self.vy = np.zeros(capacity, np.float32)
+        self.age = np.zeros(capacity, np.float32)
+        self.life = np.ones(capacity, np.float32)
+        self.kind = np.zeros(capacity, np.intp)
+        self.arrays = (self.x, self.y, self.vx, self.vy, self.age, self.life, self.kind)
+        self.scratch = np.zeros(capacity, np.float32)
+        self.rng = np.random.default_rng(seed)
+        self.budget_ms = budget_ms or 1000 / TICK_RATE
+        self.frame_ms = 0.0    # Smoothed time the recent frames took.
+        self.quality = 1.0
+        self.build_sprites()
+
+    def build_sprites(self):
+        """
+        Renders every kind at every fade level; sprite kind * levels + level
+        is drawn with its top-left at the particle's position minus offset.
+        """
+        self.sprites = []
+        offsets = []
+        for color, radius in PARTICLE_KINDS:
+            for level in range(PARTICLE_FADE_LEVELS):
+                fade = level / PARTICLE_FADE_LEVELS
+                r = max(1, round(radius * (1 - 0.5 * fade)))
+                surf = pygame.Surface((r * 2, r * 2)).convert()
+                surf.fill(COLORKEY)
+                pygame.draw.circle(surf, color, (r, r), r)
+                surf.set_colorkey(COLORKEY)
+                surf.set_alpha(round(255 * (1 - fade)))
+                self.sprites.append(surf)
+                offsets.append(r)
+        self.sprite_offsets = np.array(offsets, np.float32)
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, kind, x, y, count, angle, spread, speed, life):
+        """
+        Emits count * quality particles of a kind at (x, y), heading within
+        spread/2 radians of angle. speed (pixels per second) and life
+        (seconds) are (low, high) ranges.
+        """
+        n = min(int(count * self.quality + self.rng.random()), self.capacity - self.count)
+        if n <= 0:
+            return
+        rng = self.rng
+        s = slice(self.count, self.count + n)
+        heading = angle + (rng.random(n, np.float32) - 0.5) * spread
+        v = speed[0] + rng.random(n, np.float32) * (speed[1] - speed[0])
+        self.x[s] = x
+        self.y[s] = y
+        self.vx[s] = np.cos(heading) * v
+        self.vy[s] = np.sin(heading) * v
+        self.age[s] = 0.0
+        self.life[s] = life[0] + rng.random(n, np.float32) * (life[1] - life[0])
+        self.kind[s] = kind
+        self.count += n
+
+    def sparks(self, x, y, angle):
+        self.emit(PARTICLE_SPARK, x, y, 24, angle, math.pi * 0.6, (120, 360), (0.2, 0.5))
+
+    def trail(self, x, y):
+        self.emit(PARTICLE_TRAIL, x, y, 2, 0.0, math.tau, (0, 30), (0.15, 0.3))
+
+    def explosion(self, x, y, angle):
+        self.emit(PARTICLE_EXPLOSION, x, y, 160, angle, math.pi, (60, 420), (0.5, 1.2))
+
+    def update(self, dt):
+        """
+        Moves every particle on by dt seconds and drops the expired ones.
+        """
+        n = self.count
+        if not n:
+            return
+        vx, vy, step = self.vx[:n], self.vy[:n], self.scratch[:n]
+        damping = math.exp(-PARTICLE_DRAG * dt)
+        vx *= damping
+        vy *= damping
+        np.multiply(vx, dt, out=step)
+        self.x[:n] += step
+        np.multiply(vy, dt, out=step)
+        self.y[:n] += step
+        age = self.age[:n]
+        age += dt
+        alive = age < self.life[:n]
+        live = int(np.count_nonzero(alive))
+        if live < n:
+            for a in self.arrays:
+                a[:live] = a[:n][alive]
+            self.count = live
+
+    def draw(self, canvas):
+        """
+        Draws every particle and returns the rects they cover.
+        """
+        n = self.count
+        if not n:
+            return []
+        level = (self.age[:n] * (PARTICLE_FADE_LEVELS / self.life[:n])).astype(np.intp)
+        np.minimum(level, PARTICLE_FADE_LEVELS - 1, out=level)
+        index = self.kind[:n] * PARTICLE_FADE_LEVELS + level
+        offset = self.sprite_offsets[index]
+        xs = (self.x[:n] - offset).astype(np.intp).tolist()
+        ys = (self.y[:n] - offset).astype(np.intp).tolist()
+        sprites = self.sprites
+        return canvas.blits([(sprites[i], (x, y)) for i, x, y in zip(index.tolist(), xs, ys)])
+
+    def adjust_quality(self, frame_ms):
+        """
+        Called once a frame with the milliseconds the last frame took to
+        run (not counting the frame cap's wait).
+        """
+        self.frame_ms += (frame_ms - self.frame_ms) * 0.1
+        if self.frame_ms > self.budget_ms:
+            self.quality = max(PARTICLE_MIN_QUALITY, self.quality * 0.95)
+        elif self.frame_ms < self.budget_ms * 0.75:
+            self.quality = min(1.0, self.quality + 0.01)
+
+# --------------- Rendering ---------------
+class DirtyRectRenderer:
+    """
+    Presents frames drawn over a cached full-screen background layer.
+    In RENDER_DIRTY mode each frame only restores the regions drawn in the
+    previous frame from the background layer and pushes those plus the newly
+    drawn regions with pygame.display.update(). RENDER_FULL blits the whole
+    layer and flips, and is also used for the first frame after the
+    background changes or invalidate() is called.
+    Usage per frame: begin(), draw and collect the returned rects, present(rects).
+    """
+    def __init__(self, screen, mode=RENDER_MODE):
+        self.screen = screen
+        self.mode = mode
+        self.screen_rect = screen.get_rect()
+        self.background = None
+        self.previous = []
+        self.full_redraw = True
+
+    def set_background(self, background):
+        if background is not self.background:
+            self.background = background
+            self.invalidate()
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def begin(self):
+        if self.mode == RENDER_FULL or self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.background, rect, rect)
+
+    def present(self, rects):
+        current = [rect.clip(self.screen_rect) for rect in rects if rect]
+        if self.mode == RENDER_FULL or self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + current)
+        self.previous = current
+
+class SurfaceBackend:
+    """
+    Draws with software Surface blits and pygame.draw onto the display
+    surface, presented through a DirtyRectRenderer. The window is always
+    WIDTH x HEIGHT.
+    Both backends take the same calls: per frame set_background(layer),
+    begin(), any number of draw calls (each returns the rect it covered)
+    and present(rects).
+    """
+    def __init__(self, render_mode=RENDER_MODE):
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("PyPong 2025")
+        self.renderer = DirtyRectRenderer(self.screen, render_mode)
+
+    def set_background(self, background):
+        self.renderer.set_background(background)
+
+    def invalidate(self):
+        self.renderer.invalidate()
+
+    def begin(self):
+        self.renderer.begin()
+
+    def present(self, rects):
+        self.renderer.present(rects)
+
+    def to_logical(self, pos):
+        # Window pixels are game pixels.
+        return pos
+
+    def blit(self, surface, dest):
+        return self.screen.blit(surface, dest)
+
+    def blits(self, sequence):
+        return self.screen.blits(sequence)
+
+    def fill_rect(self, color, rect):
+        return pygame.draw.rect(self.screen, color, rect)
+
+    def outline_rect(self, color, rect, width=1):
+        return pygame.draw.rect(self.screen, color, rect, width)
+
+    def circle(self, color, center, radius):
+        return pygame.draw.circle(self.screen, color, center, radius)
+
+    def line(self, color, start, end):
+        return pygame.draw.aaline(self.screen, color, start, end)
+
+class TextureBackend:
+    """
+    Draws with a pygame._sdl2.video Renderer. Surfaces are uploaded to
+    Textures the first time they are drawn and the textures are cached for
+    as long as the surface lives; the background layer is re-uploaded when
+    invalidate() says it changed. The game is drawn at a fixed logical
+    resolution of WIDTH x HEIGHT that SDL scales (letterboxed) to whatever
+    size the resizable window has.
+    Pass accelerated=0 for SDL's software renderer, which needs no GPU.
+    Every frame is drawn in full, so the rects passed to present() are unused.
+    """
+    def __init__(self, window_size=WINDOW_SIZE, accelerated=-1):
+        # Surfaces are still converted to the display format, so a hidden
+        # display surface stands in for the window the game draws into.
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = video.Window("PyPong 2025", size=window_size, resizable=True)
+        self.renderer = video.Renderer(self.window, accelerated=accelerated)
+        self.renderer.logical_size = (WIDTH, HEIGHT)
+        self.textures = weakref.WeakKeyDictionary()    # Surface -> Texture.
+        self.circles = {}                              # (color, radius) -> Texture.
+        self.background = None
+        self.background_texture = None
+        self.background_changed = True
+
+    def texture(self, surface):
+        texture = self.textures.get(surface)
+        if texture is None:
+            texture = video.Texture.from_surface(self.renderer, surface)
+            self.textures[surface] = texture
+        return texture
+
+    def set_background(self, background):
+        if background is not self.background:
+            self.background = background
+            self.invalidate()
+
+    def invalidate(self):
+        self.background_changed = True
+
+    def begin(self):
+        if self.background_changed:
+            # Layers are all WIDTH x HEIGHT, so one texture is updated in place.
+            if self.background_texture is None:
+                self.background_texture = video.Texture.from_surface(self.renderer, self.background)
+            else:
+                self.background_texture.update(self.background)
+            self.background_changed = False
+        self.renderer.draw_color = pygame.Color(BLACK)
+        self.renderer.clear()
+        self.background_texture.draw()
+
+    def present(self, rects):
+        self.renderer.present()
+
+    def to_logical(self, pos):
+        """
+        Maps a position in the window (like pygame.mouse.get_pos()) to
+        game coordinates.
+        """
+        viewport = self.renderer.get_viewport()
+        scale_x, scale_y = self.renderer.scale
+        return (int(pos[0] / scale_x) - viewport.x, int(pos[1] / scale_y) - viewport.y)
+
+    def blit(self, surface, dest):
+        rect = surface.get_rect(topleft=(dest[0], dest[1]))
+        self.texture(surface).draw(dstrect=rect)
+        return rect
+
+    def blits(self, sequence):
+        return [self.blit(surface, dest) for surface, dest in sequence]
+
+    def fill_rect(self, color, rect):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.fill_rect(rect)
+        return pygame.Rect(rect)
+
+    def outline_rect(self, color, rect, width=1):
+        rect = pygame.Rect(rect)
+        self.renderer.draw_color = pygame.Color(color)
+        for i in range(width):
+            self.renderer.draw_rect(rect.inflate(-2 * i, -2 * i))
+        return rect
+
+    def circle(self, color, center, radius):
+        texture = self.circles.get((color, radius))
+        if texture is None:
+            surf = pygame.Surface((radius * 2, radius * 2))
+            surf.fill(COLORKEY)
+            pygame.draw.circle(surf, color, (radius, radius), radius)
+            surf.set_colorkey(COLORKEY)
+            texture = self.circles[(color, radius)] = video.Texture.from_surface(self.renderer, surf)
+        rect = pygame.Rect(0, 0, radius * 2, radius * 2)
+        rect.center = center
+        texture.draw(dstrect=rect)
+        return rect
+
+    def line(self, color, start, end):
+        self.renderer.draw_color = pygame.Color(color)
+        self.renderer.draw_line(start, end)
+        return pygame.Rect(start, (1, 1)).union(pygame.Rect(end, (1, 1)))
+
+def open_backend(backend=RENDER_BACKEND, render_mode=RENDER_MODE, window_size=WINDOW_SIZE, accelerated=-1):
+    """
+    Opens the window with the given BACKEND_* and returns the backend.
+    """
+    if backend == BACKEND_TEXTURE:
+        if video is not None:
+            return TextureBackend(window_size, accelerated)
+        print("[RENDER] Error: pygame._sdl2.video is not available; using the surface backend.")
+    return SurfaceBackend(render_mode)
+
 # --------------- Customizable Drawable Classes ---------------
 class Button:
     def __init__(self, text, pos, font, base_color=LIGHTGRAY, hover_color=ACCENT, font_name="Arial", image=None):
@@ -94,12 +1168,16 @@ class Button:
         self.hover_color = hover_color
         self.current_color = base_color
         self.font_name = font_name
-        self.image = image  # Optional image for the button.
+        self.set_image(image)
         self.render_text = self.font.render(self.text, True, self.current_color)
         self.rect = self.render_text.get_rect(center=self.pos)
         self.scale = 1.0
         self.target_scale = 1.0
 
+    def set_image(self, image):
+        self.image = image  # Optional image for the button.
+        self.skin = ScaledImage(image) if image else None
+
     def update(self, mouse_pos):
         if self.rect.collidepoint(mouse_pos):
             self.current_color = self.hover_color
@@ -109,424 +1187,1022 @@ class Button:
             self.target_scale = 1.0
 
         self.scale += (self.target_scale - self.scale) * 0.2
-        font_size = max(1, int(self.font.get_height() * self.scale))
-        font = pygame.font.SysFont(self.font_name, font_size)
-        self.render_text = font.render(self.text, True, self.current_color)
+        font_size = quantize_size(self.font.get_height() * self.scale)
+        self.render_text = text_cache.render(self.text, font_size, self.current_color, self.font_name)
         self.rect = self.render_text.get_rect(center=self.pos)
 
-    def draw(self, screen):
+    def draw(self, canvas):
+        """
+        Draws the button and returns the screen area it covers.
+        """
         if self.image:
-            img = pygame.transform.scale(self.image, (self.rect.width + 20, self.rect.height + 10))
+            img = self.skin.get((self.rect.width + 20, self.rect.height + 10))
             img_rect = img.get_rect(center=self.pos)
-            screen.blit(img, img_rect)
+            area = canvas.blit(img, img_rect)
         else:
-            pygame.draw.rect(screen, DARKGRAY, self.rect.inflate(20, 10))
-        screen.blit(self.render_text, self.rect)
+            area = canvas.fill_rect(DARKGRAY, self.rect.inflate(20, 10))
+        return area.union(canvas.blit(self.render_text, self.rect))
 
     def is_clicked(self, mouse_pos, mouse_pressed):
         return self.rect.collidepoint(mouse_pos) and mouse_pressed
 
-class Paddle:
+class Paddle(pong_core.Paddle):
+    __slots__ = ("image", "skin", "_rect")
+
     def __init__(self, x, y, width=10, height=100, speed=7, image=None):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.speed = speed
+        super().__init__(x, y, width, height, speed)
         self.image = image  # Optional image for the paddle.
+        self.skin = ScaledImage(image) if image else None
+        self._rect = pygame.Rect(x, y, width, height)    # Reused by draw().
 
-    def move(self, dy):
-        self.rect.y += dy
-        if self.rect.top < 0:
-            self.rect.top = 0
-        if self.rect.bottom > HEIGHT:
-            self.rect.bottom = HEIGHT
-
-    def draw(self, screen):
+    def draw(self, canvas, alpha=1.0):
+        """
+        Draws the paddle alpha of the way from its position at the start of
+        the last tick to its current one.
+        """
+        self._rect.update(int(self.x), int(self.prev_y + (self.y - self.prev_y) * alpha), self.width, self.height)
         if self.image:
-            img = pygame.transform.scale(self.image, (self.rect.width, self.rect.height))
-            screen.blit(img, self.rect)
-        else:
-            pygame.draw.rect(screen, WHITE, self.rect)
+            img = self.skin.get(self._rect.size)
+            return canvas.blit(img, self._rect)
+        return canvas.fill_rect(WHITE, self._rect)
+
+class Ball(pong_core.Ball):
+    __slots__ = ("image", "skin")
 
-class Ball:
     def __init__(self, x, y, radius=10, speed=5, image=None):
-        self.x = x
-        self.y = y
-        self.radius = radius
-        self.speed = speed
+        super().__init__(x, y, radius, speed)
         self.image = image  # Optional image for the ball.
-        self.angle = math.radians(45)
-        self.dx = math.cos(self.angle) * self.speed
-        self.dy = math.sin(self.angle) * self.speed
-        self.hit_flash = 0
-
-    def update(self):
-        self.x += self.dx
-        self.y += self.dy
-
-        # Bounce off top/bottom.
-        if self.y - self.radius < 0 or self.y + self.radius > HEIGHT:
-            self.dy *= -1
-            play_sound("ball_hit.mp3")
-        if self.hit_flash > 0:
-            self.hit_flash -= 1
-
-    def draw(self, screen):
+        self.skin = ScaledImage(image) if image else None
+
+    def draw(self, canvas, alpha=1.0):
+        """
+        Draws the ball alpha of the way from its position at the start of
+        the last tick to its current one.
+        """
+        center = (int(self.prev_x + (self.x - self.prev_x) * alpha), int(self.prev_y + (self.y - self.prev_y) * alpha))
         if self.image:
             diameter = self.radius * 2
-            img = pygame.transform.scale(self.image, (diameter, diameter))
-            img_rect = img.get_rect(center=(int(self.x), int(self.y)))
-            screen.blit(img, img_rect)
-        else:
-            color = WHITE if self.hit_flash == 0 else ACCENT
-            pygame.draw.circle(screen, color, (int(self.x), int(self.y)), self.radius)
-
-    def reset(self):
-        self.x = WIDTH // 2
-        self.y = HEIGHT // 2
-        self.angle = math.radians(45)
-        self.dx = math.cos(self.angle) * self.speed * (1 if pygame.time.get_ticks() % 2 == 0 else -1)
-        self.dy = math.sin(self.angle) * self.speed
+            img = self.skin.get((diameter, diameter))
+            img_rect = img.get_rect(center=center)
+            return canvas.blit(img, img_rect)
+        color = WHITE if self.hit_flash == 0 else ACCENT
+        return canvas.circle(color, center, self.radius)
 
 # --------------- Pong Game Class ---------------
-class PongGame:
-    def __init__(self, sound_on=True, paddle_img=None, ball_img=None):
-        self.player = Paddle(30, HEIGHT // 2 - 50, image=paddle_img)
-        self.cpu = Paddle(WIDTH - 40, HEIGHT // 2 - 50, image=paddle_img)
-        self.ball = Ball(WIDTH // 2, HEIGHT // 2, image=ball_img)
-        self.sound_on = sound_on
+def read_input(keys):
+    """
+    Turns the pressed keys into the player's input word.
+    """
+    player_input = 0
+    if keys[pygame.K_w]:
+        player_input |= pong_core.INPUT_UP
+    if keys[pygame.K_s]:
+        player_input |= pong_core.INPUT_DOWN
+    return player_input
 
-        self.player_score = 0
-        self.cpu_score = 0
-        self.winning_score = 10
+class PongGame(pong_core.GameCore):
+    """
+    The simulation core plus everything that needs pygame: keyboard input,
+    sound effects and drawing.
+    """
+    def __init__(self, sound_on=True, paddle_img=None, ball_img=None, seed=None, tick_rate=pong_core.TICK_RATE):
+        super().__init__(
+            seed=seed,
+            tick_rate=tick_rate,
+            player=Paddle(30, HEIGHT // 2 - 50, image=paddle_img),
+            cpu=Paddle(WIDTH - 40, HEIGHT // 2 - 50, image=paddle_img),
+            ball=Ball(WIDTH // 2, HEIGHT // 2, image=ball_img),
+        )
+        self.sound_on = sound_on
         self.explosion_event = None
+        self.replay = None    # pong_replay.Replay being recorded, if any.
+        self.particles = None    # ParticleSystem for the hit and score effects, if any.
+
+    def play_sound(self, name):
+        # The single place where game sound effects honour the sound setting.
+        if self.sound_on:
+            play_sound(name)
 
     def update(self, keys):
-        # Player controls.
-        if keys[pygame.K_w]:
-            self.player.move(-self.player.speed)
-        if keys[pygame.K_s]:
-            self.player.move(self.player.speed)
-
-        # ----- CPU AI with Dynamic Error -----
-        if self.ball.dx > 0:
-            time_to_reach = (self.cpu.rect.left - self.ball.x) / self.ball.dx if self.ball.dx != 0 else 0
-            predicted_y = self.ball.y + self.ball.dy * time_to_reach
-            while predicted_y < 0 or predicted_y > HEIGHT:
-                if predicted_y < 0:
-                    predicted_y = -predicted_y
-                elif predicted_y > HEIGHT:
-                    predicted_y = 2 * HEIGHT - predicted_y
-            # Dynamic error amplitude: large when player score is 0, small near winning score.
-            max_error = 50
-            min_error = 5
-            # Clamp player's score between 0 and winning_score.
-            score_factor = min(max(self.player_score, 0), self.winning_score)
-            error_amplitude = max_error - ((score_factor / self.winning_score) * (max_error - min_error))
-            error = random.uniform(-error_amplitude, error_amplitude)
-            target_y = predicted_y + error
-        else:
-            target_y = HEIGHT / 2
-
-        if self.cpu.rect.centery < target_y:
-            self.cpu.move(self.cpu.speed * 0.7)
-        elif self.cpu.rect.centery > target_y:
-            self.cpu.move(-self.cpu.speed * 0.7)
-        # --------------------------------------
-
-        self.ball.update()
-
-        # ----- Collision Detection -----
-        if self.player.rect.collidepoint(self.ball.x - self.ball.radius, self.ball.y):
-            if self.ball.dx < 0:
-                self.ball.dx *= -1
-                self.ball.hit_flash = 10
-                if self.sound_on:
-                    play_sound("ball_hit.mp3")
-        if self.cpu.rect.collidepoint(self.ball.x + self.ball.radius, self.ball.y):
-            if self.ball.dx > 0:
-                self.ball.dx *= -1
-                self.ball.hit_flash = 10
-                if self.sound_on:
-                    play_sound("ball_hit.mp3")
-        # --------------------------------
-
-        # ----- Scoring -----
-        if self.ball.x < 0:
-            self.cpu_score += 1
-            if self.sound_on:
-                play_sound("score.mp3")
-            self.ball.speed += 0.5
+        self.advance(read_input(keys))
+
+    def advance(self, player_input):
+        """
+        Steps the match on an input word, recording it if a replay is being
+        recorded, and plays the sounds for what happened.
+        """
+        if self.replay is not None:
+            self.replay.record(self, player_input)
+        x, y = self.ball.x, self.ball.y
+        events = self.step(player_input)
+        self.play_event_sounds(events)
+        self.emit_particles(events, x, y)
+
+    def play_event_sounds(self, events):
+        if events & (pong_core.EVENT_WALL_BOUNCE | pong_core.EVENT_PADDLE_HIT):
+            self.play_sound("ball_hit.mp3")
+        if events & pong_core.EVENT_CPU_SCORED:
+            self.play_sound("score.mp3")
             self.explosion_event = "lose"
-            self.ball.reset()
-        if self.ball.x > WIDTH:
-            self.player_score += 1
-            if self.sound_on:
-                play_sound("score.mp3")
-            self.ball.speed += 0.5
+        if events & pong_core.EVENT_PLAYER_SCORED:
+            self.play_sound("score.mp3")
             self.explosion_event = "win"
-            self.ball.reset()
-        # -------------------
-        
-    def draw(self, screen):
-        pygame.draw.aaline(screen, LIGHTGRAY, (WIDTH // 2, 0), (WIDTH // 2, HEIGHT))
-        self.player.draw(screen)
-        self.cpu.draw(screen)
-        self.ball.draw(screen)
-        font = pygame.font.SysFont("Arial", 36)
-        score_text = font.render(f"{self.player_score}   {self.cpu_score}", True, WHITE)
-        screen.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, 20))
+
+    def emit_particles(self, events, x, y):
+        """
+        Emits the effects for a tick's events: sparks where the ball
+        bounced, an explosion where it left the field (it was at (x, y) at
+        the start of the tick) and otherwise the ball's trail.
+        """
+        particles = self.particles
+        if particles is None:
+            return
+        ball = self.ball
+        if events & pong_core.EVENT_PLAYER_SCORED:
+            particles.explosion(WIDTH, y, math.pi)
+        elif events & pong_core.EVENT_CPU_SCORED:
+            particles.explosion(0, y, 0.0)
+        else:
+            if events & (pong_core.EVENT_WALL_BOUNCE | pong_core.EVENT_PADDLE_HIT):
+                particles.sparks(ball.x, ball.y, math.atan2(ball.dy, ball.dx))
+            particles.trail(ball.x, ball.y)
+
+    def draw_field(self, canvas):
+        canvas.line(LIGHTGRAY, (WIDTH // 2, 0), (WIDTH // 2, HEIGHT))
+
+    def draw(self, canvas, field=True, alpha=1.0):
+        """
+        Draws the match and returns the rects of everything that moves.
+        Pass field=False when the static field is already part of the
+        background layer. alpha is how far the frame is between the last
+        tick and the next one; moving objects are interpolated by it.
+        """
+        if field:
+            self.draw_field(canvas)
+        score_text = text_cache.render(f"{self.player_score}   {self.cpu_score}", 36, WHITE)
+        return [
+            self.player.draw(canvas, alpha),
+            self.cpu.draw(canvas, alpha),
+            self.ball.draw(canvas, alpha),
+            canvas.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, 20)),
+        ]
 
     def game_over(self):
-        if self.player_score >= self.winning_score:
+        winner = self.winner()
+        if winner == pong_core.WINNER_PLAYER:
             return STATE_WIN
-        if self.cpu_score >= self.winning_score:
+        if winner == pong_core.WINNER_CPU:
             return STATE_LOSE
         return None
 
-# --------------- Main Application Class ---------------
-class App:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("PyPong 2025")
-        self.clock = pygame.time.Clock()
-        self.state = STATE_MENU
-        self.sound_on = True
+# --------------- Scenes ---------------
+class FixedStep:
+    """
+    Turns frame times into whole simulation ticks of 1 / tick_rate seconds,
+    so a simulation advances at the same rate however fast frames are drawn.
+    alpha is how far the current frame is between the last tick and the next.
+    """
+    def __init__(self, tick_rate):
+        self.tick_time = 1.0 / tick_rate
+        self.accumulator = 0.0
 
-        self.menu_font = pygame.font.SysFont("Arial", 30)
-        self.title_font = pygame.font.SysFont("Arial", 80)
+    def reset(self):
+        self.accumulator = 0.0
 
-        # Load assets.
-        self.background_image = self.load_image(BACKGROUND_FILENAME, (WIDTH, HEIGHT))
-        self.title_image = self.load_image(TITLE_FILENAME)  # Title asset.
-        self.paddle_image = self.load_image(PADDLE_FILENAME)
-        self.ball_image = self.load_image(BALL_FILENAME)
-        self.button_image = self.load_image(BUTTON_FILENAME)
+    def advance(self, dt):
+        """
+        Adds dt seconds and returns how many ticks are due. More than
+        MAX_CATCHUP_TICKS behind, the backlog is dropped rather than letting
+        the simulation spiral.
+        """
+        self.accumulator += dt
+        ticks = int(self.accumulator / self.tick_time)
+        if ticks >= MAX_CATCHUP_TICKS:
+            ticks = MAX_CATCHUP_TICKS
+            self.accumulator = min(self.accumulator - ticks * self.tick_time, self.tick_time)
+        else:
+            self.accumulator -= ticks * self.tick_time
+        return ticks
 
-        self.buttons = {
-            "start": Button("Start Game - VS CPU", (WIDTH // 2, HEIGHT // 2 - 20), self.menu_font, font_name="Arial", image=self.button_image),
-            "sound": Button("Sound - ON", (WIDTH // 2, HEIGHT // 2 + 40), self.menu_font, font_name="Arial", image=self.button_image),
-            "quit":  Button("Quit", (WIDTH // 2, HEIGHT // 2 + 100), self.menu_font, font_name="Arial", image=self.button_image)
-        }
-        self.game = None
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.tick_time, 1.0)
 
-    def load_image(self, filename, size=None):
-        if not os.path.exists(filename):
-            return None
-        try:
-            img = pygame.image.load(filename).convert_alpha()
-            if size:
-                img = pygame.transform.scale(img, size)
-            return img
-        except Exception as e:
-            print(f"[ASSETS] Error loading {filename}: {e}")
-            return None
+class Scene:
+    """
+    One screen of the app. The App keeps a stack of scenes: every frame the
+    top scene gets the events, is updated and is drawn. An overlay scene
+    also lets the scenes under it run and draw first, and passes on the
+    events it does not handle.
+    Scenes are built once and reused: enter() is called each time one is
+    put on the stack and exit() when it is taken off.
+    """
+    state = None      # The STATE_* it shows, whose follow-up assets are prefetched.
+    overlay = False
 
-    def show_explosion_popup(self, message, sound_file):
-        if self.sound_on:
-            play_sound(sound_file)
-        popup_duration = 1500  # milliseconds.
-        start_time = pygame.time.get_ticks()
-        big_font = pygame.font.SysFont("Arial", 100)
-        while pygame.time.get_ticks() - start_time < popup_duration:
-            self.clock.tick(FPS)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            if self.background_image:
-                self.screen.blit(self.background_image, (0, 0))
-            else:
-                self.screen.fill(DARKGRAY)
-            text_surf = big_font.render(message, True, ACCENT)
-            text_rect = text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            self.screen.blit(text_surf, text_rect)
-            pygame.display.flip()
+    def __init__(self, app):
+        self.app = app
 
-    def run(self):
-        while True:
-            if self.state == STATE_MENU:
-                self.menu_loop()
-            elif self.state == STATE_GAME:
-                self.game_loop()
-            elif self.state == STATE_PAUSE:
-                self.pause_loop()
-            elif self.state in (STATE_WIN, STATE_LOSE):
-                self.end_loop()
-            else:
-                pygame.quit()
-                sys.exit()
+    @property
+    def layer(self):
+        # Background layer the scene is drawn over.
+        return self.app.menu_layer
 
-    def menu_loop(self):
-        if self.sound_on:
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        """
+        Returns True if the event was consumed.
+        """
+        return False
+
+    def update(self, dt):
+        pass
+
+    def draw(self, canvas):
+        """
+        Draws the scene and returns the rects it covered.
+        """
+        return []
+
+    def play_button_sound(self, mouse_pos, mouse_pressed):
+        """
+        Plays the button sound if this frame's click landed on one of the
+        scene's buttons.
+        """
+        if mouse_pressed and self.app.sound_on and any(button.is_clicked(mouse_pos, True) for button in self.buttons.values()):
+            play_sound("button_press.mp3")
+
+class LoadingScene(Scene):
+    """
+    Shows a progress bar until the menu's assets are loaded, then moves on
+    to the app's first scene.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self.bar = pygame.Rect(0, 0, WIDTH // 2, 24)
+        self.bar.center = (WIDTH // 2, HEIGHT // 2 + 40)
+
+    def update(self, dt):
+        app = self.app
+        if all(assets.done(key) for key in app.loading_keys):
+            app.apply_menu_assets()
+            app.switch_scene(app.first_scene)
+
+    def draw(self, canvas):
+        text_surf = text_cache.render("Loading...", 40, WHITE)
+        dirty = [canvas.blit(text_surf, text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 20)))]
+        dirty.append(canvas.outline_rect(LIGHTGRAY, self.bar, 2))
+        fill = self.bar.inflate(-8, -8)
+        fill.width = int(fill.width * assets.progress(self.app.loading_keys))
+        if fill.width > 0:
+            canvas.fill_rect(ACCENT, fill)
+        return dirty
+
+class MenuScene(Scene):
+    state = STATE_MENU
+
+    def __init__(self, app):
+        super().__init__(app)
+        font = text_cache.font("Arial", 30)
+        self.buttons = {
+            "start":    Button("Start Game - VS CPU", (WIDTH // 2, HEIGHT // 2 - 20), font, font_name="Arial"),
+            "practice": Button("Practice - Rewind", (WIDTH // 2, HEIGHT // 2 + 40), font, font_name="Arial"),
+            "sound":    Button("Sound - ON", (WIDTH // 2, HEIGHT // 2 + 100), font, font_name="Arial"),
+            "quit":     Button("Quit", (WIDTH // 2, HEIGHT // 2 + 160), font, font_name="Arial")
+        }
+        self.clicked = False
+        self.time = 0.0    # Seconds the menu has run; drives the title animation.
+
+    def enter(self):
+        self.buttons["sound"].text = "Sound - ON" if self.app.sound_on else "Sound - OFF"
+        if self.app.sound_on:
             play_background_music("bg.mp3")
         else:
             stop_background_music()
-        while self.state == STATE_MENU:
-            self.clock.tick(FPS)
-            mouse_pos = pygame.mouse.get_pos()
-            mouse_pressed = False
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    mouse_pressed = True
-            for button in self.buttons.values():
-                button.update(mouse_pos)
-            if self.buttons["start"].is_clicked(mouse_pos, mouse_pressed):
-                self.game = PongGame(sound_on=self.sound_on, paddle_img=self.paddle_image, ball_img=self.ball_image)
-                self.state = STATE_GAME
-            elif self.buttons["sound"].is_clicked(mouse_pos, mouse_pressed):
-                self.sound_on = not self.sound_on
-                sound_text = "Sound - ON" if self.sound_on else "Sound - OFF"
-                self.buttons["sound"].text = sound_text
-                if self.sound_on:
-                    play_background_music("bg.mp3")
-                else:
-                    stop_background_music()
-            elif self.buttons["quit"].is_clicked(mouse_pos, mouse_pressed):
-                pygame.quit()
-                sys.exit()
-            # Draw background.
-            if self.background_image:
-                self.screen.blit(self.background_image, (0, 0))
-            else:
-                self.screen.fill(DARKGRAY)
-            # ----- Title Screen (Animated) -----
-            # If a title image is loaded, animate it with a pulsating (scaling) effect.
-            if self.title_image:
-                # Compute scale factor based on time (sine wave).
-                scale_factor = 1 + 0.05 * math.sin(pygame.time.get_ticks() * 0.002)
-                img_width = int(self.title_image.get_width() * scale_factor)
-                img_height = int(self.title_image.get_height() * scale_factor)
-                title_img = pygame.transform.scale(self.title_image, (img_width, img_height))
-                title_rect = title_img.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 150))
-                self.screen.blit(title_img, title_rect)
-            else:
-                # Fallback animated text title.
-                scale_factor = 1 + 0.05 * math.sin(pygame.time.get_ticks() * 0.002)
-                font_size = int(80 * scale_factor)
-                anim_font = pygame.font.SysFont("Arial", font_size)
-                title_surf = anim_font.render("Ping Pong", True, WHITE)
-                title_rect = title_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 150))
-                self.screen.blit(title_surf, title_rect)
-            # Draw buttons.
-            for button in self.buttons.values():
-                button.draw(self.screen)
-            pygame.display.flip()
 
-    def game_loop(self):
-        if self.sound_on:
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.clicked = True
+            return True
+        return False
+
+    def update(self, dt):
+        app = self.app
+        self.time += dt
+        mouse_pos = app.mouse_pos
+        mouse_pressed, self.clicked = self.clicked, False
+        for button in self.buttons.values():
+            button.update(mouse_pos)
+        self.play_button_sound(mouse_pos, mouse_pressed)
+        if self.buttons["start"].is_clicked(mouse_pos, mouse_pressed):
+            app.start_match()
+        elif self.buttons["practice"].is_clicked(mouse_pos, mouse_pressed):
+            app.start_match(practice=True)
+        elif self.buttons["sound"].is_clicked(mouse_pos, mouse_pressed):
+            app.sound_on = not app.sound_on
+            self.enter()
+        elif self.buttons["quit"].is_clicked(mouse_pos, mouse_pressed):
+            app.quit()
+
+    def draw(self, canvas):
+        dirty = []
+        # ----- Title Screen (Animated) -----
+        # If a title image is loaded, animate it with a pulsating (scaling) effect.
+        if self.app.title_image:
+            # Pick the precomputed frame for the current point of the sine wave.
+            title_img = self.app.title_pulse.frame(self.time * 1000)
+            title_rect = title_img.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 150))
+            dirty.append(canvas.blit(title_img, title_rect))
+        else:
+            # Fallback animated text title.
+            scale_factor = 1 + 0.05 * math.sin(self.time * 1000 * 0.002)
+            font_size = quantize_size(80 * scale_factor)
+            title_surf = text_cache.render("Ping Pong", font_size, WHITE)
+            title_rect = title_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 150))
+            dirty.append(canvas.blit(title_surf, title_rect))
+        # Draw buttons.
+        for button in self.buttons.values():
+            dirty.append(button.draw(canvas))
+        return dirty
+
+class GameScene(Scene):
+    """
+    A match against the CPU (App.game). Scores show the popup overlay while
+    play goes on; once the match is won or lost and the popup is gone, the
+    end screen follows.
+    In a practice match every tick is recorded in App.rewind, and holding
+    REWIND_KEY plays the match backwards through it.
+    """
+    state = STATE_GAME
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.step = FixedStep(app.tick_rate)
+        self.result = None
+        self.practice = False
+        self.rewinding = False
+
+    @property
+    def layer(self):
+        return self.app.game_layer
+
+    def enter(self):
+        if self.app.sound_on:
             play_background_music("game_music.mp3")
         else:
             stop_background_music()
-        while self.state == STATE_GAME:
-            self.clock.tick(FPS)
-            keys = pygame.key.get_pressed()
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    if self.sound_on and not MUSIC_PAUSED:
-                        pygame.mixer.music.pause()
-                        globals()['MUSIC_PAUSED'] = True
-                    self.state = STATE_PAUSE
-                    break
-            if self.state == STATE_GAME:
-                self.game.update(keys)
-                if self.game.explosion_event is not None:
-                    if self.game.explosion_event == "win":
-                        self.show_explosion_popup("You Win!", "boom_win.mp3")
-                    elif self.game.explosion_event == "lose":
-                        self.show_explosion_popup("You Lose!", "boom_lose.mp3")
-                    self.game.explosion_event = None
-                new_state = self.game.game_over()
-                if new_state is not None:
-                    self.state = new_state
-                if self.background_image:
-                    self.screen.blit(self.background_image, (0, 0))
-                else:
-                    self.screen.fill(BLACK)
-                self.game.draw(self.screen)
-                pygame.display.flip()
-
-    def pause_loop(self):
-        pause_font = pygame.font.SysFont("Arial", 40)
-        resume_button = Button("Resume", (WIDTH // 2, HEIGHT // 2 - 40), pause_font, font_name="Arial", image=self.button_image)
-        menu_button = Button("Main Menu", (WIDTH // 2, HEIGHT // 2 + 20), pause_font, font_name="Arial", image=self.button_image)
-        quit_button = Button("Quit", (WIDTH // 2, HEIGHT // 2 + 80), pause_font, font_name="Arial", image=self.button_image)
-        buttons = [resume_button, menu_button, quit_button]
-        while self.state == STATE_PAUSE:
-            self.clock.tick(FPS)
-            mouse_pos = pygame.mouse.get_pos()
-            mouse_pressed = False
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    mouse_pressed = True
-                elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    self.state = STATE_GAME
-                    if self.sound_on and MUSIC_PAUSED:
-                        pygame.mixer.music.unpause()
-                        globals()['MUSIC_PAUSED'] = False
-                    break
-            for button in buttons:
-                button.update(mouse_pos)
-            if resume_button.is_clicked(mouse_pos, mouse_pressed):
-                self.state = STATE_GAME
-                if self.sound_on and MUSIC_PAUSED:
-                    pygame.mixer.music.unpause()
-                    globals()['MUSIC_PAUSED'] = False
-            elif menu_button.is_clicked(mouse_pos, mouse_pressed):
-                self.state = STATE_MENU
-                if self.sound_on:
-                    play_background_music("bg.mp3")
-            elif quit_button.is_clicked(mouse_pos, mouse_pressed):
-                pygame.quit()
-                sys.exit()
-            if self.background_image:
-                self.screen.blit(self.background_image, (0, 0))
-            else:
-                self.screen.fill(DARKGRAY)
-            pause_title = pygame.font.SysFont("Arial", 60).render("Paused", True, ACCENT)
-            title_rect = pause_title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 120))
-            self.screen.blit(pause_title, title_rect)
-            for button in buttons:
-                button.draw(self.screen)
-            pygame.display.flip()
+        self.step.reset()
+        self.result = None
+        self.rewinding = False
+        self.app.rewind.clear()
+        if self.app.particles is not None:
+            self.app.particles.clear()
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.app.push_scene(self.app.pause_scene)
+            return True
+        return False
+
+    def update(self, dt):
+        app = self.app
+        app.update_particles(dt)
+        if self.result is not None:
+            if app.popup_scene not in app.scenes:
+                app.end_scene.state = self.result
+                app.switch_scene(app.end_scene)
+            return
+        game = app.game
+        keys = pygame.key.get_pressed()
+        self.rewinding = self.practice and keys[REWIND_KEY]
+        for _ in range(self.step.advance(dt)):
+            if self.rewinding:
+                app.rewind.rewind(game)
+                continue
+            if self.practice:
+                app.rewind.push(game)
+            game.update(keys)
+            if game.explosion_event == "win":
+                app.popup_scene.show("You Win!", "boom_win.mp3")
+            elif game.explosion_event == "lose":
+                app.popup_scene.show("You Lose!", "boom_lose.mp3")
+            game.explosion_event = None
+            self.result = game.game_over()
+            if self.result is not None:
+                app.save_replay()
+                break
+
+    def draw(self, canvas):
+        app = self.app
+        # Rewound states are drawn as they are rather than interpolated forwards.
+        alpha = 1.0 if self.rewinding else self.step.alpha
+        dirty = app.draw_particles(canvas) + app.game.draw(canvas, field=False, alpha=alpha)
+        if self.practice:
+            rewind = app.rewind
+            seconds = rewind.count / app.game.tick_rate
+            label = text_cache.render(f"PRACTICE  Hold R to rewind ({seconds:.1f} s)   Esc: pause", 20, LIGHTGRAY)
+            dirty.append(canvas.blit(label, (10, HEIGHT - 30)))
+        return dirty
+
+class PopupScene(Scene):
+    """
+    Overlay that shows a message over the scene below for POPUP_SECONDS.
+    """
+    overlay = True
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.text_surf = None
+        self.text_rect = None
+        self.remaining = 0.0
+
+    def show(self, message, sound_file):
+        if self.app.sound_on:
+            play_sound(sound_file)
+        self.text_surf = text_cache.render(message, 100, ACCENT)
+        self.text_rect = self.text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        self.remaining = POPUP_SECONDS
+        if self not in self.app.scenes:
+            self.app.push_scene(self)
+
+    def update(self, dt):
+        self.remaining -= dt
+        if self.remaining <= 0:
+            self.app.remove_scene(self)
+
+    def draw(self, canvas):
+        return [canvas.blit(self.text_surf, self.text_rect)]
+
+class PauseScene(Scene):
+    state = STATE_PAUSE
+
+    def __init__(self, app):
+        super().__init__(app)
+        font = text_cache.font("Arial", 40)
+        self.buttons = {
+            "resume": Button("Resume", (WIDTH // 2, HEIGHT // 2 - 40), font, font_name="Arial"),
+            "menu":   Button("Main Menu", (WIDTH // 2, HEIGHT // 2 + 20), font, font_name="Arial"),
+            "quit":   Button("Quit", (WIDTH // 2, HEIGHT // 2 + 80), font, font_name="Arial")
+        }
+        self.clicked = False
+
+    def enter(self):
+        global MUSIC_PAUSED
+        self.clicked = False
+        if self.app.sound_on and not MUSIC_PAUSED:
+            pygame.mixer.music.pause()
+            MUSIC_PAUSED = True
+
+    def exit(self):
+        global MUSIC_PAUSED
+        if MUSIC_PAUSED:
+            pygame.mixer.music.unpause()
+            MUSIC_PAUSED = False
 
-    def end_loop(self):
-        font = pygame.font.SysFont("Arial", 60)
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.clicked = True
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.app.remove_scene(self)
+        return True
+
+    def update(self, dt):
+        app = self.app
+        mouse_pos = app.mouse_pos
+        mouse_pressed, self.clicked = self.clicked, False
+        for button in self.buttons.values():
+            button.update(mouse_pos)
+        self.play_button_sound(mouse_pos, mouse_pressed)
+        if self.buttons["resume"].is_clicked(mouse_pos, mouse_pressed):
+            app.remove_scene(self)
+        elif self.buttons["menu"].is_clicked(mouse_pos, mouse_pressed):
+            app.save_replay()
+            app.switch_scene(app.menu_scene)
+        elif self.buttons["quit"].is_clicked(mouse_pos, mouse_pressed):
+            app.quit()
+
+    def draw(self, canvas):
+        pause_title = text_cache.render("Paused", 60, ACCENT)
+        title_rect = pause_title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 120))
+        dirty = [canvas.blit(pause_title, title_rect)]
+        for button in self.buttons.values():
+            dirty.append(button.draw(canvas))
+        return dirty
+
+class EndScene(Scene):
+    """
+    "You Win!" or "You Lose!" (state is STATE_WIN or STATE_LOSE) until a
+    key or mouse button is pressed.
+    """
+    state = STATE_WIN
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.elapsed = 0.0
+
+    def enter(self):
+        self.elapsed = 0.0
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN:
+            self.app.switch_scene(self.app.menu_scene)
+            return True
+        return False
+
+    def update(self, dt):
+        self.elapsed += dt
+
+    def draw(self, canvas):
         message = "You Win!" if self.state == STATE_WIN else "You Lose!"
-        counter = 0
-        while self.state in (STATE_WIN, STATE_LOSE):
-            self.clock.tick(FPS)
-            counter += 1
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN:
-                    self.state = STATE_MENU
-                    self.buttons["start"].text = "Start Game - VS CPU"
-                    self.buttons["sound"].text = "Sound - ON" if self.sound_on else "Sound - OFF"
-                    if self.sound_on:
-                        play_background_music("bg.mp3")
+        scale = 1 + 0.1 * math.sin(self.elapsed * 6)
+        text_surf = text_cache.render(message, quantize_size(60 * scale), ACCENT)
+        return [canvas.blit(text_surf, text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2)))]
+
+class ReplayScene(Scene):
+    """
+    Plays back App.replay in real time. Left and Right seek by
+    REPLAY_SEEK_SECONDS, Esc goes to the main menu.
+    """
+    state = STATE_REPLAY
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.game = None
+        self.step = None
+
+    @property
+    def layer(self):
+        return self.app.game_layer
+
+    def enter(self):
+        app = self.app
+        if app.sound_on:
+            play_background_music("game_music.mp3")
+        app.apply_game_assets()
+        self.game = app.replay.new_game(PongGame, sound_on=app.sound_on, paddle_img=app.paddle_image, ball_img=app.ball_image)
+        self.game.particles = app.particles
+        self.step = FixedStep(app.replay.tick_rate)
+        if app.particles is not None:
+            app.particles.clear()
+
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN:
+            return False
+        replay = self.app.replay
+        seek_ticks = REPLAY_SEEK_SECONDS * replay.tick_rate
+        if event.key == pygame.K_ESCAPE:
+            self.app.switch_scene(self.app.menu_scene)
+        elif event.key == pygame.K_LEFT:
+            replay.seek(self.game, self.game.tick - seek_ticks)
+            self.step.reset()
+        elif event.key == pygame.K_RIGHT:
+            replay.seek(self.game, self.game.tick + seek_ticks)
+            self.step.reset()
+        return True
+
+    def update(self, dt):
+        replay, game = self.app.replay, self.game
+        self.app.update_particles(dt)
+        for _ in range(self.step.advance(dt)):
+            if game.tick >= replay.end_tick:
+                break
+            game.advance(replay.player_input(game.tick - replay.start_tick))
+            game.explosion_event = None
+
+    def draw(self, canvas):
+        replay, game = self.app.replay, self.game
+        dirty = self.app.draw_particles(canvas)
+        dirty += game.draw(canvas, field=False, alpha=self.step.alpha if game.tick < replay.end_tick else 1.0)
+        seconds = (game.tick - replay.start_tick) / replay.tick_rate
+        total_seconds = replay.tick_count / replay.tick_rate
+        label = text_cache.render(f"REPLAY  {seconds:.1f} / {total_seconds:.1f} s   Left/Right: seek   Esc: menu", 20, LIGHTGRAY)
+        dirty.append(canvas.blit(label, (10, HEIGHT - 30)))
+        return dirty
+
+class OnlineScene(Scene):
+    """
+    Plays a two-player match on the pong_net server at App.server.
+    Networking runs on the main thread: the asyncio loop is pumped once per
+    frame and one input is sent per tick.
+    """
+    state = STATE_ONLINE
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.loop = None
+        self.client = None
+        self.game = None
+        self.step = FixedStep(TICK_RATE)
+
+    @property
+    def layer(self):
+        return self.app.game_layer
+
+    def enter(self):
+        app = self.app
+        host, port = app.server
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.client = self.loop.run_until_complete(pong_net.connect(host, port))
+        except OSError as e:
+            print(f"[NET] Error connecting to {host}:{port}: {e}")
+            app.switch_scene(app.menu_scene)
+            return
+        if app.sound_on:
+            play_background_music("game_music.mp3")
+        app.apply_game_assets()
+        # Only used to draw what the client sees.
+        self.game = PongGame(sound_on=app.sound_on, paddle_img=app.paddle_image, ball_img=app.ball_image)
+        self.game.particles = app.particles
+        self.step.reset()
+        if app.particles is not None:
+            app.particles.clear()
+
+    def exit(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.app.switch_scene(self.app.menu_scene)
+            return True
+        return False
+
+    def update(self, dt):
+        client = self.client
+        pong_net.pump(self.loop, client)
+        self.step.tick_time = 1.0 / client.tick_rate
+        player_input = read_input(pygame.key.get_pressed())
+        for _ in range(self.step.advance(dt)):
+            client.send_input(player_input)
+        events = client.take_events()
+        self.game.play_event_sounds(events)
+        self.app.update_particles(dt)
+        view = client.view(time.perf_counter())
+        if view is not None:
+            ball = self.game.ball
+            ball.x, ball.y, ball.dx, ball.dy = view.ball_x, view.ball_y, view.ball_dx, view.ball_dy
+            self.game.emit_particles(events, view.ball_x, view.ball_y)
+
+    def draw(self, canvas):
+        client, game = self.client, self.game
+        view = client.view(time.perf_counter())
+        dirty = self.app.draw_particles(canvas)
+        if view is not None:
+            game.player.y = game.player.prev_y = view.player_y
+            game.cpu.y = game.cpu.prev_y = view.cpu_y
+            game.ball.x = game.ball.prev_x = view.ball_x
+            game.ball.y = game.ball.prev_y = view.ball_y
+            game.ball.hit_flash = view.hit_flash
+            game.player_score, game.cpu_score = view.player_score, view.cpu_score
+            dirty += game.draw(canvas, field=False)
+        if client.full:
+            message = "Server is full"
+        elif view is None:
+            message = "Connecting..."
+        elif view.status == pong_net.STATUS_WAITING:
+            message = "Waiting for opponent..."
+        elif view.status == pong_net.STATUS_OVER:
+            mine = view.player_score if client.side == pong_net.SIDE_LEFT else view.cpu_score
+            message = "You Win!" if mine >= game.winning_score else "You Lose!"
+        else:
+            message = None
+        if message:
+            text_surf = text_cache.render(message, 40, ACCENT)
+            dirty.append(canvas.blit(text_surf, text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))))
+        stats = client.stats
+        rtt = f"{stats.rtt:.0f}" if stats.rtt is not None else "-"
+        label = text_cache.render(f"RTT {rtt} ms   loss {stats.loss * 100:.0f}%   Esc: menu", 20, LIGHTGRAY)
+        dirty.append(canvas.blit(label, (10, HEIGHT - 30)))
+        return dirty
+
+# --------------- Main Application Class ---------------
+class App:
+    """
+    Runs a stack of scenes (see Scene) in one main loop: frame pacing,
+    events and drawing are handled here once for every scene.
+    """
+    def __init__(self, render_mode=RENDER_MODE, tick_rate=TICK_RATE, max_fps=FPS, profile=PROFILE_ENABLED, replay=None, server=None,
+                 backend=RENDER_BACKEND, window_size=WINDOW_SIZE, accelerated=-1):
+        self.canvas = open_backend(backend, render_mode, window_size, accelerated)
+        self.clock = pygame.time.Clock()
+        self.tick_rate = tick_rate
+        self.max_fps = max_fps
+        profiler.enabled = profile
+        self.sound_on = True
+        self.replay = replay    # pong_replay.Replay to play back.
+        self.server = server    # (host, port) of a pong_net server to play on.
+
+        # Assets load on a worker thread while the loading screen is shown;
+        # until then everything draws with the plain fallbacks.
+        sound_bank.preload(())
+        for name in SOUND_EFFECTS:
+            assets.request_sound(name)
+        self.loading_keys = assets.prefetch_scene(STATE_MENU)
+        assets.prefetch_scene(STATE_GAME)
+        self.assets_applied = False
+        self.background_image = None
+        self.background_animation = None
+        self.background_started = False    # The animation is started once, on first use.
+        self.title_image = None
+        self.title_pulse = None
+        self.paddle_image = None
+        self.ball_image = None
+        self.button_image = None
+        self.menu_layer = self.build_layer(DARKGRAY)
+        self.game_layer = self.build_layer(BLACK, field=True)
+        self.game = None
+        self.rewind = pong_core.RewindBuffer(REWIND_SECONDS * tick_rate)    # Practice mode history.
+        self.particles = None
+        if PARTICLES_ENABLED and np is not None:
+            self.particles = ParticleSystem(budget_ms=1000 / max_fps if max_fps else None)
+
+        # Every scene is built once here and reused.
+        self.loading_scene = LoadingScene(self)
+        self.menu_scene = MenuScene(self)
+        self.game_scene = GameScene(self)
+        self.popup_scene = PopupScene(self)
+        self.pause_scene = PauseScene(self)
+        self.end_scene = EndScene(self)
+        self.replay_scene = ReplayScene(self)
+        self.online_scene = OnlineScene(self)
+        self.first_scene = self.menu_scene    # Shown once loading is done.
+        if replay is not None:
+            self.first_scene = self.replay_scene
+        elif server is not None:
+            self.first_scene = self.online_scene
+        self.scenes = []
+        self.mouse_pos = (0, 0)
+        self.last_frame_time = time.perf_counter()
+
+    def apply_menu_assets(self):
+        """
+        Puts the loaded menu assets to use. Called once they are all in.
+        """
+        self.background_image = assets.image(BACKGROUND_FILENAME)
+        self.title_image = assets.image(TITLE_FILENAME)  # Title asset.
+        self.title_pulse = PulseAnimation(self.title_image) if self.title_image else None
+        self.button_image = assets.image(BUTTON_FILENAME)
+        for scene in (self.menu_scene, self.pause_scene):
+            for button in scene.buttons.values():
+                button.set_image(self.button_image)
+        self.menu_layer = self.build_layer(DARKGRAY)
+        self.game_layer = self.build_layer(BLACK, field=True)
+        self.assets_applied = True
+
+    def apply_game_assets(self):
+        # Game skins are optional: whatever has not loaded yet draws plain.
+        self.paddle_image = assets.image(PADDLE_FILENAME)
+        self.ball_image = assets.image(BALL_FILENAME)
+
+    def finish_loading(self):
+        """
+        Blocks until the menu and game assets are loaded and applies them.
+        For tools and benchmarks; the game shows the loading screen instead.
+        """
+        assets.wait(self.loading_keys + assets.prefetch_scene(STATE_GAME))
+        self.apply_menu_assets()
+        self.apply_game_assets()
+
+    def build_layer(self, fill_color, field=False):
+        """
+        Builds a full-screen background layer: the background image (or a
+        plain fill) plus, for gameplay, the static field markings.
+        """
+        layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+        self.paint_layer(layer, self.background_image, fill_color, field)
+        return layer
+
+    def paint_layer(self, layer, background, fill_color, field=False):
+        if background:
+            layer.blit(background, (0, 0))
+        else:
+            layer.fill(fill_color)
+        if field:
+            pygame.draw.aaline(layer, LIGHTGRAY, (WIDTH // 2, 0), (WIDTH // 2, HEIGHT))
+
+    def update_background(self, now):
+        """
+        Moves the animated background on to its frame for now (in
+        milliseconds), repainting the menu layer in place when it changes.
+        Only the menu screens animate: the gameplay layer keeps the first
+        frame, so a match stays on dirty-rect updates, and the decoder waits
+        while the menu is not shown. It is started the first time the menu
+        is, not when the assets load.
+        """
+        if not self.scenes or self.active_scenes()[0].layer is not self.menu_layer:
+            return
+        if not self.background_started and ANIMATED_BACKGROUND and self.background_image:
+            self.background_started = True
+            self.background_animation = AnimatedBackground.open(BACKGROUND_FILENAME, (WIDTH, HEIGHT))
+        if self.background_animation is None:
+            return
+        frame = self.background_animation.update(now)
+        if frame is not None:
+            self.paint_layer(self.menu_layer, frame, DARKGRAY)
+            self.canvas.invalidate()
+
+    def save_replay(self):
+        """
+        Saves the replay of the current match, if one is being recorded.
+        """
+        if self.game is None or self.game.replay is None:
+            return
+        replay, self.game.replay = self.game.replay, None
+        if not replay.tick_count:
+            return
+        try:
+            replay.save(REPLAY_FILENAME)
+        except OSError as e:
+            print(f"[REPLAY] Error saving {REPLAY_FILENAME}: {e}")
+
+    def close(self):
+        """
+        Releases what the App started itself: the background decoder thread
+        and its frames. The App can still draw afterwards, with a still
+        background.
+        """
+        self.background_started = True
+        if self.background_animation is not None:
+            self.background_animation.close()
+            self.background_animation = None
+
+    def quit(self):
+        self.save_replay()
+        self.close()
+        if profiler.count:
+            profiler.export(PROFILE_EXPORT_FILENAME)
+        pygame.quit()
+        sys.exit()
+
+    def handle_common_event(self, event):
+        """
+        Handles the events every scene reacts to the same way.
+        Returns True if the event was consumed.
+        """
+        if event.type == pygame.QUIT or event.type == pygame.WINDOWCLOSE:
+            self.quit()
+        if event.type == pygame.KEYDOWN and event.key == PROFILE_OVERLAY_KEY:
+            profiler.toggle_overlay()
+            return True
+        return False
+
+    # --------------- Scene Stack ---------------
+    def switch_scene(self, scene):
+        """
+        Replaces every scene on the stack with the given one.
+        """
+        while self.scenes:
+            self.scenes.pop().exit()
+        self.push_scene(scene)
+
+    def push_scene(self, scene):
+        self.scenes.append(scene)
+        if scene.state is not None:
+            assets.prefetch_scene(NEXT_SCENE.get(scene.state))
+        scene.enter()
+
+    def remove_scene(self, scene):
+        if scene in self.scenes:
+            self.scenes.remove(scene)
+            scene.exit()
+
+    def active_scenes(self):
+        """
+        Returns the scenes that run this frame, bottom first: the top scene
+        and, under overlays, the scenes down to the first that is not one.
+        """
+        start = len(self.scenes) - 1
+        while start > 0 and self.scenes[start].overlay:
+            start -= 1
+        return self.scenes[start:]
+
+    def start_match(self, practice=False):
+        """
+        Starts a new match against the CPU. Practice matches can be rewound
+        and are not recorded as replays.
+        """
+        self.apply_game_assets()
+        self.game = PongGame(sound_on=self.sound_on, paddle_img=self.paddle_image, ball_img=self.ball_image, tick_rate=self.tick_rate)
+        self.game.particles = self.particles
+        if RECORD_REPLAYS and not practice:
+            self.game.replay = pong_replay.Replay.record_from(self.game)
+        self.game_scene.practice = practice
+        self.switch_scene(self.game_scene)
+
+    # --------------- Main Loop ---------------
+    def run(self):
+        self.switch_scene(self.loading_scene)
+        while True:
+            self.frame()
+
+    def frame(self):
+        """
+        Runs one frame: events go to the active scenes from the top down
+        until one consumes them, then the scenes are updated and drawn
+        from the bottom up.
+        """
+        dt = self.begin_frame()
+        self.mouse_pos = self.canvas.to_logical(pygame.mouse.get_pos())
+        for event in pygame.event.get():
+            if self.handle_common_event(event):
+                continue
+            for scene in reversed(self.active_scenes()):
+                if scene.handle_event(event):
                     break
-            scale = 1 + 0.1 * math.sin(counter * 0.1)
-            font_size = int(60 * scale)
-            anim_font = pygame.font.SysFont("Arial", font_size)
-            text_surf = anim_font.render(message, True, ACCENT)
-            text_rect = text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            if self.background_image:
-                self.screen.blit(self.background_image, (0, 0))
-            else:
-                self.screen.fill(DARKGRAY)
-            self.screen.blit(text_surf, text_rect)
-            pygame.display.flip()
+        profiler.mark(PHASE_EVENTS)
+        self.update_scenes(dt)
+        profiler.mark(PHASE_UPDATE)
+        self.draw_scenes()
+
+    def update_particles(self, dt):
+        if self.particles is not None:
+            self.particles.update(dt)
+
+    def draw_particles(self, canvas):
+        if self.particles is None:
+            return []
+        return self.particles.draw(canvas)
+
+    def update_scenes(self, dt):
+        for scene in self.active_scenes():
+            # A scene taken off the stack by one below it this frame is skipped.
+            if scene in self.scenes:
+                scene.update(dt)
+
+    def draw_scenes(self):
+        active = self.active_scenes()
+        self.canvas.set_background(active[0].layer)
+        self.canvas.begin()
+        dirty = []
+        for scene in active:
+            dirty.extend(scene.draw(self.canvas))
+        self.present(dirty)
+
+    def present(self, dirty):
+        """
+        Finishes a frame: adds the profiler overlay if it is shown and
+        pushes the dirty rects to the display.
+        """
+        if profiler.overlay:
+            dirty.append(profiler.draw_overlay(self.canvas))
+        profiler.mark(PHASE_DRAW)
+        self.canvas.present(dirty)
+        profiler.mark(PHASE_PRESENT)
+
+    def begin_frame(self):
+        """
+        Starts a frame: waits for the frame cap and does the per-frame
+        housekeeping every scene shares. Returns the seconds since the
+        last frame started.
+        """
+        self.clock.tick(self.max_fps)
+        profiler.begin_frame()
+        if self.particles is not None:
+            self.particles.adjust_quality(self.clock.get_rawtime())
+        now = time.perf_counter()
+        dt, self.last_frame_time = now - self.last_frame_time, now
+        self.update_background(pygame.time.get_ticks())
+        return dt
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, pong_net.DEFAULT_PORT
+    return host, int(port)
+
+def parse_size(text):
+    width, _, height = text.partition("x")
+    return int(width), int(height)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="PyPong 2025")
+    parser.add_argument("--replay", metavar="FILE", help=f"Play back a recorded match (matches are saved to {REPLAY_FILENAME}).")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", type=parse_address, help="Play a two-player match on a pong_net.py server.")
+    parser.add_argument("--backend", choices=(BACKEND_SURFACE, BACKEND_TEXTURE), default=RENDER_BACKEND,
+                        help="Draw with software surfaces or with an SDL2 Renderer and textures.")
+    parser.add_argument("--window-size", metavar="WxH", type=parse_size, default=WINDOW_SIZE,
+                        help="Initial window size for the texture backend; the game is scaled to fit.")
+    parser.add_argument("--software", action="store_true", help="Use SDL's software renderer with the texture backend.")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    app = App()
+    args = parse_args()
+    replay = None
+    if args.replay:
+        try:
+            replay = pong_replay.Replay.load(args.replay)
+        except (OSError, ValueError) as e:
+            print(f"[REPLAY] Error loading {args.replay}: {e}")
+    app = App(replay=replay, server=args.connect, backend=args.backend, window_size=args.window_size,
+              accelerated=0 if args.software else -1)
     app.run()
@@ -0,0 +1,309 @@
+"""
+Vectorized batch simulator for PyPong.
+
+BatchSim runs N independent player-versus-CPU matches at once, keeping the
+state of every match in NumPy arrays and stepping all of them with array
+operations. It follows the rules of pong_core.GameCore operation for
+operation, so match i of a batch seeded with seeds[i] plays out exactly like
+GameCore(seed=seeds[i]) given the same inputs.
+
+Requires NumPy.
+"""
+import math
+
+import numpy as np
+
+import pong_core
+from pong_core import (
+    WIDTH, HEIGHT, BASE_TICK_RATE, TICK_RATE,
+    INPUT_UP, INPUT_DOWN,
+    EVENT_WALL_BOUNCE, EVENT_PADDLE_HIT, EVENT_PLAYER_SCORED, EVENT_CPU_SCORED,
+    DIFFICULTIES,
+    PADDLE_WIDTH, PADDLE_HEIGHT, PADDLE_SPEED, PLAYER_X, CPU_X,
+    BALL_RADIUS, BALL_SPEED, BALL_ANGLE, BALL_SPEED_STEP, HIT_FLASH_TICKS,
+    MAX_BOUNCES_PER_TICK, SURFACE_NONE, SURFACE_WALL, SURFACE_PLAYER, SURFACE_CPU,
+)
+
+# Winners returned by BatchSim.winners().
+NO_WINNER     = 0
+PLAYER_WINNER = 1
+CPU_WINNER    = 2
+
+_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX1  = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2  = np.uint64(0x94D049BB133111EB)
+_U30, _U27, _U31, _U11 = np.uint64(30), np.uint64(27), np.uint64(31), np.uint64(11)
+_INV_2_53 = 1.0 / 9007199254740992.0
+
+# Same expressions as pong_core.Ball so the products round identically.
+_BALL_COS = math.cos(BALL_ANGLE)
+_BALL_SIN = math.sin(BALL_ANGLE)
+
+def _rng_random(state, mask):
+    """
+    Advances the SplitMix64 states selected by mask and returns a float in
+    [0, 1) for every match (values for unselected matches are meaningless).
+    """
+    z = state + _GAMMA
+    state[mask] = z[mask]
+    z = (z ^ (z >> _U30)) * _MIX1
+    z = (z ^ (z >> _U27)) * _MIX2
+    z = z ^ (z >> _U31)
+    return (z >> _U11).astype(np.float64) * _INV_2_53
+
+class BatchSim:
+    """
+    N matches stepped together.
+    The CPU plays with the given difficulty (a pong_core.Difficulty or the
+    name of one); max_error and min_error override its error curve and may
+    be per-match arrays, which makes it cheap to sweep the curve across a
+    batch. A match stops advancing once it has a winner; reset() starts
+    chosen matches over.
+    """
+    def __init__(self, n, seeds=None, tick_rate=TICK_RATE, difficulty="normal", max_error=None, min_error=None, winning_score=10):
+        self.n = n
+        if seeds is None:
+            seeds = [pong_core.Rng().state for _ in range(n)]
+        self.rng_state = np.zeros(n, dtype=np.uint64)
+        self.tick_rate = tick_rate
+        self.step_scale = BASE_TICK_RATE / tick_rate
+        self.tick = np.zeros(n, dtype=np.int64)
+
+        self.player_y = np.zeros(n)
+        self.cpu_y = np.zeros(n)
+        self.ball_x = np.zeros(n)
+        self.ball_y = np.zeros(n)
+        self.ball_speed = np.zeros(n)
+        self.ball_dx = np.zeros(n)
+        self.ball_dy = np.zeros(n)
+        self.hit_flash = np.zeros(n)
+
+        self.player_score = np.zeros(n, dtype=np.int64)
+        self.cpu_score = np.zeros(n, dtype=np.int64)
+        self.winning_score = winning_score
+        if isinstance(difficulty, str):
+            difficulty = DIFFICULTIES[difficulty]
+        if max_error is None:
+            max_error = difficulty.max_error
+        if min_error is None:
+            min_error = difficulty.min_error
+        self.max_error = np.broadcast_to(np.asarray(max_error, dtype=np.float64), (n,))
+        self.min_error = np.broadcast_to(np.asarray(min_error, dtype=np.float64), (n,))
+        self.speed_factor = difficulty.speed_factor
+
+        # Cached AI aims, recomputed for a match after its ball changes direction.
+        self.cpu_aim = np.zeros(n)
+        self.new_segment = np.zeros(n, dtype=bool)
+        self.player_aim = np.zeros(n)
+        self.player_new_segment = np.zeros(n, dtype=bool)
+        self.reset(np.ones(n, dtype=bool), seeds)
+
+    def reset(self, mask, seeds):
+        """
+        Starts the matches selected by mask over from the beginning, seeded
+        with seeds (one per selected match), as fresh GameCores would.
+        """
+        seeds = np.array([int(seed) & pong_core.MASK64 for seed in seeds], dtype=np.uint64)
+        count = int(np.count_nonzero(mask))
+        if seeds.shape != (count,):
+            raise ValueError(f"expected {count} seeds, got {seeds.shape[0]}")
+        self.rng_state[mask] = seeds
+        self.tick[mask] = 0
+        self.player_y[mask] = HEIGHT // 2 - PADDLE_HEIGHT // 2
+        self.cpu_y[mask] = HEIGHT // 2 - PADDLE_HEIGHT // 2
+        self.ball_x[mask] = WIDTH // 2
+        self.ball_y[mask] = HEIGHT // 2
+        self.ball_speed[mask] = BALL_SPEED
+        self.ball_dx[mask] = _BALL_COS * BALL_SPEED
+        self.ball_dy[mask] = _BALL_SIN * BALL_SPEED
+        self.hit_flash[mask] = 0
+        self.player_score[mask] = 0
+        self.cpu_score[mask] = 0
+        self.cpu_aim[mask] = HEIGHT / 2
+        self.new_segment[mask] = True
+        self.player_aim[mask] = HEIGHT / 2
+        self.player_new_segment[mask] = True
+
+    def winners(self):
+        """
+        Returns NO_WINNER, PLAYER_WINNER or CPU_WINNER for every match.
+        """
+        result = np.full(self.n, NO_WINNER, dtype=np.int8)
+        result[self.cpu_score >= self.winning_score] = CPU_WINNER
+        result[self.player_score >= self.winning_score] = PLAYER_WINNER
+        return result
+
+    def active(self):
+        return (self.player_score < self.winning_score) & (self.cpu_score < self.winning_score)
+
+    def _move(self, y, dy, mask):
+        # Same comparisons as pong_core.Paddle.move so clamping rounds identically.
+        y[mask] += dy
+        y[mask & (y < 0)] = 0
+        y[mask & (y + PADDLE_HEIGHT > HEIGHT)] = HEIGHT - PADDLE_HEIGHT
+
+    def _aim(self, update, aim, face_x, incoming, opponent_score):
+        """
+        Like pong_core.PaddleAI.target for the matches in update: a fresh
+        intercept plus aim error where the ball is incoming, the middle of
+        the field otherwise. Returns the new aims.
+        """
+        x, y, dx, dy = self.ball_x, self.ball_y, self.ball_dx, self.ball_dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            time_to_reach = (face_x - x) / dx
+        predicted_y = np.remainder(y + dy * time_to_reach, 2 * HEIGHT)
+        predicted_y = np.where(predicted_y > HEIGHT, 2 * HEIGHT - predicted_y, predicted_y)
+        score_factor = np.minimum(np.maximum(opponent_score, 0), self.winning_score)
+        error_amplitude = self.max_error - ((score_factor / self.winning_score) * (self.max_error - self.min_error))
+        low = -error_amplitude
+        noise = low + (error_amplitude - low) * _rng_random(self.rng_state, incoming)
+        return np.where(incoming, predicted_y + noise, np.where(update, HEIGHT / 2, aim))
+
+    def cpu_target(self, mask):
+        """
+        Returns the y each CPU paddle steers towards. Matches in mask that
+        started a new rally segment get a fresh intercept and aim error.
+        """
+        update = mask & self.new_segment
+        if update.any():
+            self.cpu_aim = self._aim(update, self.cpu_aim, CPU_X, update & (self.ball_dx > 0), self.player_score)
+            self.new_segment &= ~update
+        return self.cpu_aim
+
+    def player_target(self, mask):
+        """
+        Returns the y each left paddle steers towards when the AI plays it.
+        """
+        update = mask & self.player_new_segment
+        if update.any():
+            self.player_aim = self._aim(update, self.player_aim, PLAYER_X + PADDLE_WIDTH, update & (self.ball_dx < 0), self.cpu_score)
+            self.player_new_segment &= ~update
+        return self.player_aim
+
+    def _steer(self, y, target_y, mask):
+        speed = PADDLE_SPEED * self.speed_factor * self.step_scale
+        centery = y + PADDLE_HEIGHT / 2
+        self._move(y, speed, mask & (centery < target_y))
+        self._move(y, -speed, mask & (centery > target_y))
+
+    def step(self, player_input=0, cpu_input=None):
+        """
+        Advances every unfinished match by one tick.
+        player_input and cpu_input are input words, either one for all
+        matches or an array with one per match; None lets the AI steer that
+        paddle, as with GameCore.step. Returns an array with the EVENT_* bits
+        of every match.
+        """
+        scale = self.step_scale
+        n = self.n
+        active = self.active()
+        events = np.zeros(n, dtype=np.uint8)
+        self.tick[active] += 1
+
+        # Player controls.
+        if player_input is None:
+            self._steer(self.player_y, self.player_target(active), active)
+        else:
+            player_input = np.broadcast_to(np.asarray(player_input), (n,))
+            self._move(self.player_y, -PADDLE_SPEED * scale, active & (player_input & INPUT_UP != 0))
+            self._move(self.player_y, PADDLE_SPEED * scale, active & (player_input & INPUT_DOWN != 0))
+
+        # CPU paddle.
+        if cpu_input is None:
+            self._steer(self.cpu_y, self.cpu_target(active), active)
+        else:
+            cpu_input = np.broadcast_to(np.asarray(cpu_input), (n,))
+            self._move(self.cpu_y, -PADDLE_SPEED * scale, active & (cpu_input & INPUT_UP != 0))
+            self._move(self.cpu_y, PADDLE_SPEED * scale, active & (cpu_input & INPUT_DOWN != 0))
+
+        events |= self.sweep_ball(active)
+
+        # Scoring.
+        cpu_scored = active & (self.ball_x < 0)
+        player_scored = active & (self.ball_x > WIDTH)
+        self.cpu_score[cpu_scored] += 1
+        self.player_score[player_scored] += 1
+        events[cpu_scored] |= EVENT_CPU_SCORED
+        events[player_scored] |= EVENT_PLAYER_SCORED
+        self.serve(cpu_scored | player_scored)
+        self.new_segment |= events != 0
+        self.player_new_segment |= events != 0
+        return events
+
+    def sweep_ball(self, active):
+        """
+        Moves every active ball through one tick with continuous collision
+        detection, pass by pass like pong_core.GameCore.sweep_ball. Returns
+        the EVENT_* bits for the bounces.
+        """
+        scale = self.step_scale
+        n = self.n
+        events = np.zeros(n, dtype=np.uint8)
+        flashing = active & (self.hit_flash > 0)
+        self.hit_flash[flashing] = np.maximum(0, self.hit_flash[flashing] - scale)
+
+        x, y, dx, dy = self.ball_x, self.ball_y, self.ball_dx, self.ball_dy
+        moving = active.copy()
+        remaining = np.ones(n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(MAX_BOUNCES_PER_TICK):
+                if not moving.any():
+                    break
+                vx = dx * scale
+                vy = dy * scale
+                t_hit = remaining.copy()
+                surface = np.full(n, SURFACE_NONE, dtype=np.int8)
+                # Walls.
+                t = np.where(vy < 0, np.maximum((BALL_RADIUS - y) / vy, 0.0),
+                             np.where(vy > 0, np.maximum((HEIGHT - BALL_RADIUS - y) / vy, 0.0), np.inf))
+                hit = t < t_hit
+                t_hit[hit] = t[hit]
+                surface[hit] = SURFACE_WALL
+                # Player paddle.
+                t = (PLAYER_X + PADDLE_WIDTH + BALL_RADIUS - x) / vx
+                impact_y = y + vy * t
+                hit = (vx < 0) & (0 <= t) & (t < t_hit) \
+                    & (self.player_y <= impact_y) & (impact_y < self.player_y + PADDLE_HEIGHT)
+                t_hit[hit] = t[hit]
+                surface[hit] = SURFACE_PLAYER
+                # CPU paddle.
+                t = (CPU_X - BALL_RADIUS - x) / vx
+                impact_y = y + vy * t
+                hit = (vx > 0) & (0 <= t) & (t < t_hit) \
+                    & (self.cpu_y <= impact_y) & (impact_y < self.cpu_y + PADDLE_HEIGHT)
+                t_hit[hit] = t[hit]
+                surface[hit] = SURFACE_CPU
+
+                x[moving] += (vx * t_hit)[moving]
+                y[moving] += (vy * t_hit)[moving]
+                remaining -= t_hit
+                wall = moving & (surface == SURFACE_WALL)
+                paddle = moving & (surface >= SURFACE_PLAYER)
+                dy[wall] = -dy[wall]
+                dx[paddle] = -dx[paddle]
+                self.hit_flash[paddle] = HIT_FLASH_TICKS
+                events[wall] |= EVENT_WALL_BOUNCE
+                events[paddle] |= EVENT_PADDLE_HIT
+                moving &= surface != SURFACE_NONE
+        return events
+
+    def serve(self, mask):
+        if not mask.any():
+            return
+        self.ball_speed[mask] += BALL_SPEED_STEP
+        direction = np.where(_rng_random(self.rng_state, mask) < 0.5, 1.0, -1.0)
+        self.ball_x[mask] = WIDTH // 2
+        self.ball_y[mask] = HEIGHT // 2
+        self.ball_dx[mask] = (_BALL_COS * self.ball_speed * direction)[mask]
+        self.ball_dy[mask] = (_BALL_SIN * self.ball_speed)[mask]
+
+    def run(self, max_ticks, player_input=0):
+        """
+        Steps until every match has a winner or max_ticks have passed.
+        Returns the number of ticks stepped.
+        """
+        for tick in range(max_ticks):
+            if not self.active().any():
+                return tick
+            self.step(player_input)
+        return max_ticks
@@ -0,0 +1,471 @@
+"""
+Headless simulation core for PyPong.
+
+Everything needed to play a match (paddles, ball, CPU AI, scoring) lives here
+in plain Python with no pygame import, so matches can be simulated without a
+display or audio device. The pygame front end in pong.py subclasses these
+classes to add drawing and sound.
+
+Time advances in fixed ticks. Speeds are expressed in pixels per tick at
+BASE_TICK_RATE, which is the frame rate the game was originally tuned for;
+other tick rates scale every movement so a match plays at the same speed.
+
+Inputs are small integer words built from the INPUT_* bits, and step()
+reports what happened during the tick as a word of EVENT_* bits.
+"""
+import math
+import os
+import struct
+
+# --------------- Global Variables and Constants ---------------
+WIDTH, HEIGHT = 800, 600
+BASE_TICK_RATE = 60    # Tick rate the speeds below are tuned for.
+TICK_RATE      = 60    # Default simulation ticks per second.
+
+# Input bits.
+INPUT_UP   = 1
+INPUT_DOWN = 2
+
+# Event bits returned by GameCore.step().
+EVENT_WALL_BOUNCE   = 1
+EVENT_PADDLE_HIT    = 2
+EVENT_PLAYER_SCORED = 4
+EVENT_CPU_SCORED    = 8
+
+# Winners returned by GameCore.winner().
+WINNER_PLAYER = "player"
+WINNER_CPU    = "cpu"
+
+# CPU AI (the "normal" difficulty).
+CPU_SPEED_FACTOR = 0.7    # CPU paddle moves at this fraction of its speed.
+CPU_MAX_ERROR    = 50     # Aim error when the player has no points.
+CPU_MIN_ERROR    = 5      # Aim error when the player is about to win.
+
+# Default sizes and speeds.
+PADDLE_WIDTH  = 10
+PADDLE_HEIGHT = 100
+PADDLE_SPEED  = 7
+PLAYER_X      = 30
+CPU_X         = WIDTH - 40
+BALL_RADIUS   = 10
+BALL_SPEED    = 5
+
+BALL_ANGLE      = math.radians(45)
+BALL_SPEED_STEP = 0.5     # Ball speed gained on every point.
+HIT_FLASH_TICKS = 10
+MAX_BOUNCES_PER_TICK = 8  # Most bounces the ball resolves within one tick.
+
+# Surfaces the ball can hit, in the order ties are resolved.
+SURFACE_NONE   = 0
+SURFACE_WALL   = 1
+SURFACE_PLAYER = 2
+SURFACE_CPU    = 3
+
+MASK64 = (1 << 64) - 1
+
+# Layout of GameCore snapshots:
+# tick, rng state, player score, cpu score, segment,
+# player y and prev_y, cpu y and prev_y,
+# ball x, y, prev_x, prev_y, dx, dy, speed, hit_flash,
+# cpu AI segment and target, player AI present, segment and target.
+GAME_STATE = struct.Struct("<IQHHI" "dd" "dd" "8d" "id" "Bid")
+
+# --------------- Random Numbers ---------------
+class Rng:
+    """
+    A seeded SplitMix64 generator.
+    Its whole state is one 64-bit integer, which makes it cheap to copy and
+    easy to reproduce outside of Python (the batch simulator runs the same
+    sequence with NumPy).
+    """
+    __slots__ = ("state",)
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.state = seed & MASK64
+
+    def next_u64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self):
+        """Returns a float in [0, 1)."""
+        return (self.next_u64() >> 11) * (1.0 / 9007199254740992.0)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+# --------------- Game Objects ---------------
+class Paddle:
+    __slots__ = ("x", "y", "width", "height", "speed", "prev_y")
+
+    def __init__(self, x, y, width=PADDLE_WIDTH, height=PADDLE_HEIGHT, speed=PADDLE_SPEED):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.prev_y = y    # Position at the start of the last tick, for interpolation.
+
+    @property
+    def centery(self):
+        return self.y + self.height / 2
+
+    def move(self, dy):
+        self.y += dy
+        if self.y < 0:
+            self.y = 0
+        if self.y + self.height > HEIGHT:
+            self.y = HEIGHT - self.height
+
+    def apply_input(self, input_word, scale=1.0):
+        """
+        Moves the paddle as the given input word asks for one tick.
+        """
+        if input_word & INPUT_UP:
+            self.move(-self.speed * scale)
+        if input_word & INPUT_DOWN:
+            self.move(self.speed * scale)
+
+    def snapshot(self):
+        """
+        Returns the part of the paddle that changes during a match.
+        """
+        return (self.y, self.prev_y)
+
+    def restore(self, state):
+        self.y, self.prev_y = state
+
+class Ball:
+    __slots__ = ("x", "y", "prev_x", "prev_y", "radius", "speed", "dx", "dy", "hit_flash")
+
+    def __init__(self, x, y, radius=BALL_RADIUS, speed=BALL_SPEED):
+        self.x = x
+        self.y = y
+        self.prev_x = x    # Position at the start of the last tick, for interpolation.
+        self.prev_y = y
+        self.radius = radius
+        self.speed = speed
+        self.dx = math.cos(BALL_ANGLE) * self.speed
+        self.dy = math.sin(BALL_ANGLE) * self.speed
+        self.hit_flash = 0
+
+    def reset(self, direction=1):
+        self.x = self.prev_x = WIDTH // 2
+        self.y = self.prev_y = HEIGHT // 2
+        self.dx = math.cos(BALL_ANGLE) * self.speed * direction
+        self.dy = math.sin(BALL_ANGLE) * self.speed
+
+    def snapshot(self):
+        """
+        Returns the part of the ball that changes during a match.
+        """
+        return (self.x, self.y, self.prev_x, self.prev_y, self.dx, self.dy, self.speed, self.hit_flash)
+
+    def restore(self, state):
+        self.x, self.y, self.prev_x, self.prev_y, self.dx, self.dy, self.speed, self.hit_flash = state
+
+# --------------- Paddle AI ---------------
+def fold(y, height=HEIGHT):
+    """
+    Reflects y into [0, height] as if it had bounced between 0 and height,
+    in closed form rather than one reflection at a time.
+    """
+    y %= 2 * height
+    return 2 * height - y if y > height else y
+
+class Difficulty:
+    """
+    How well an AI paddle plays. Its aim error shrinks linearly from
+    max_error to min_error as the opponent's score approaches the winning
+    score, and it moves at speed_factor of its paddle's speed.
+    """
+    __slots__ = ("max_error", "min_error", "speed_factor")
+
+    def __init__(self, max_error=CPU_MAX_ERROR, min_error=CPU_MIN_ERROR, speed_factor=CPU_SPEED_FACTOR):
+        self.max_error = max_error
+        self.min_error = min_error
+        self.speed_factor = speed_factor
+
+    def error_amplitude(self, opponent_score, winning_score):
+        score_factor = min(max(opponent_score, 0), winning_score)
+        return self.max_error - ((score_factor / winning_score) * (self.max_error - self.min_error))
+
+DIFFICULTIES = {
+    "easy":   Difficulty(max_error=90, min_error=30, speed_factor=0.55),
+    "normal": Difficulty(),
+    "hard":   Difficulty(max_error=20, min_error=0, speed_factor=0.85),
+}
+
+class PaddleAI:
+    """
+    Steers a paddle towards where the ball will cross its face.
+    The intercept and the aim error are worked out once per rally segment
+    (each serve, wall bounce or paddle hit, counted by GameCore.segment) and
+    reused on every other tick, so an AI paddle costs a comparison per tick.
+    side is 1 for the right paddle and -1 for the left one.
+    """
+    __slots__ = ("paddle", "difficulty", "side", "segment", "target_y")
+
+    def __init__(self, paddle, difficulty=None, side=1):
+        self.paddle = paddle
+        self.difficulty = difficulty if difficulty is not None else DIFFICULTIES["normal"]
+        self.side = side
+        self.segment = -1
+        self.target_y = HEIGHT / 2
+
+    def target(self, game, opponent_score):
+        if game.segment != self.segment:
+            self.segment = game.segment
+            ball = game.ball
+            if ball.dx * self.side > 0:
+                paddle = self.paddle
+                face_x = paddle.x if self.side > 0 else paddle.x + paddle.width
+                time_to_reach = (face_x - ball.x) / ball.dx
+                error_amplitude = self.difficulty.error_amplitude(opponent_score, game.winning_score)
+                self.target_y = fold(ball.y + ball.dy * time_to_reach) + game.rng.uniform(-error_amplitude, error_amplitude)
+            else:
+                self.target_y = HEIGHT / 2
+        return self.target_y
+
+    def steer(self, target_y, scale):
+        paddle = self.paddle
+        speed = paddle.speed * self.difficulty.speed_factor * scale
+        if paddle.centery < target_y:
+            paddle.move(speed)
+        elif paddle.centery > target_y:
+            paddle.move(-speed)
+
+# --------------- Game Core ---------------
+class GameCore:
+    """
+    One match of player versus CPU, advanced one fixed tick at a time.
+    The same seed, tick rate and inputs always produce the same match.
+    difficulty is a Difficulty or the name of one in DIFFICULTIES.
+    """
+    def __init__(self, seed=None, tick_rate=TICK_RATE, player=None, cpu=None, ball=None, difficulty="normal"):
+        self.rng = Rng(seed)
+        self.tick_rate = tick_rate
+        self.step_scale = BASE_TICK_RATE / tick_rate
+        self.tick = 0
+        self.player = player if player is not None else Paddle(PLAYER_X, HEIGHT // 2 - PADDLE_HEIGHT // 2)
+        self.cpu = cpu if cpu is not None else Paddle(CPU_X, HEIGHT // 2 - PADDLE_HEIGHT // 2)
+        self.ball = ball if ball is not None else Ball(WIDTH // 2, HEIGHT // 2)
+
+        self.player_score = 0
+        self.cpu_score = 0
+        self.winning_score = 10
+        if isinstance(difficulty, str):
+            difficulty = DIFFICULTIES[difficulty]
+        self.difficulty = difficulty
+        self.cpu_ai = PaddleAI(self.cpu, difficulty, side=1)
+        self.player_ai = None
+        self.segment = 0    # Bumped whenever the ball changes direction.
+
+    def step(self, player_input=0, cpu_input=None):
+        """
+        Advances the match by one tick.
+        cpu_input is the input word for the right paddle; when it is None the
+        CPU AI steers it. A player_input of None likewise hands the left
+        paddle to an AI with the same difficulty. Returns the EVENT_* bits
+        for this tick.
+        """
+        scale = self.step_scale
+        player = self.player
+        cpu = self.cpu
+        ball = self.ball
+        events = 0
+        self.tick += 1
+        player.prev_y = player.y
+        cpu.prev_y = cpu.y
+        ball.prev_x = ball.x
+        ball.prev_y = ball.y
+
+        # Player controls.
+        if player_input is None:
+            if self.player_ai is None:
+                self.player_ai = PaddleAI(player, self.difficulty, side=-1)
+            self.player_ai.steer(self.player_ai.target(self, self.cpu_score), scale)
+        else:
+            player.apply_input(player_input, scale)
+
+        # CPU paddle.
+        if cpu_input is None:
+            self.cpu_ai.steer(self.cpu_ai.target(self, self.player_score), scale)
+        else:
+            cpu.apply_input(cpu_input, scale)
+
+        events |= self.sweep_ball(scale)
+
+        # Scoring.
+        if ball.x < 0:
+            self.cpu_score += 1
+            events |= EVENT_CPU_SCORED
+            self.serve()
+        elif ball.x > WIDTH:
+            self.player_score += 1
+            events |= EVENT_PLAYER_SCORED
+            self.serve()
+        return events
+
+    def sweep_ball(self, scale):
+        """
+        Moves the ball through one tick with continuous collision detection.
+        Each pass finds the earliest time of impact along the ball's path
+        with the walls and the paddle faces, moves the ball there, bounces it
+        and carries on with the rest of the tick, so the ball never tunnels
+        however fast it is or however low the tick rate. Returns the EVENT_*
+        bits for the bounces.
+        """
+        ball = self.ball
+        player = self.player
+        cpu = self.cpu
+        radius = ball.radius
+        events = 0
+        if ball.hit_flash > 0:
+            ball.hit_flash = max(0, ball.hit_flash - scale)
+
+        remaining = 1.0    # Fraction of the tick left to travel.
+        for _ in range(MAX_BOUNCES_PER_TICK):
+            vx = ball.dx * scale
+            vy = ball.dy * scale
+            t_hit = remaining
+            surface = SURFACE_NONE
+            # Walls: the ball's edge reaching the top or bottom.
+            if vy < 0:
+                t = max((radius - ball.y) / vy, 0.0)
+                if t < t_hit:
+                    t_hit, surface = t, SURFACE_WALL
+            elif vy > 0:
+                t = max((HEIGHT - radius - ball.y) / vy, 0.0)
+                if t < t_hit:
+                    t_hit, surface = t, SURFACE_WALL
+            # Paddles: the ball's edge reaching the front face within its height.
+            if vx < 0:
+                t = (player.x + player.width + radius - ball.x) / vx
+                if 0 <= t < t_hit:
+                    y = ball.y + vy * t
+                    if player.y <= y < player.y + player.height:
+                        t_hit, surface = t, SURFACE_PLAYER
+            elif vx > 0:
+                t = (cpu.x - radius - ball.x) / vx
+                if 0 <= t < t_hit:
+                    y = ball.y + vy * t
+                    if cpu.y <= y < cpu.y + cpu.height:
+                        t_hit, surface = t, SURFACE_CPU
+            ball.x += vx * t_hit
+            ball.y += vy * t_hit
+            if surface == SURFACE_NONE:
+                break
+            remaining -= t_hit
+            if surface == SURFACE_WALL:
+                ball.dy = -ball.dy
+                events |= EVENT_WALL_BOUNCE
+            else:
+                ball.dx = -ball.dx
+                ball.hit_flash = HIT_FLASH_TICKS
+                events |= EVENT_PADDLE_HIT
+            self.segment += 1
+        return events
+
+    def serve(self):
+        self.segment += 1
+        self.ball.speed += BALL_SPEED_STEP
+        self.ball.reset(1 if self.rng.random() < 0.5 else -1)
+
+    def winner(self):
+        if self.player_score >= self.winning_score:
+            return WINNER_PLAYER
+        if self.cpu_score >= self.winning_score:
+            return WINNER_CPU
+        return None
+
+    # --------------- Snapshots ---------------
+    def snapshot_into(self, buffer, offset=0):
+        """
+        Packs everything about the match that changes while it is played,
+        RNG state included, into GAME_STATE.size bytes of buffer at offset.
+        """
+        cpu_ai = self.cpu_ai
+        player_ai = self.player_ai
+        GAME_STATE.pack_into(
+            buffer, offset,
+            self.tick, self.rng.state, self.player_score, self.cpu_score, self.segment,
+            *self.player.snapshot(), *self.cpu.snapshot(), *self.ball.snapshot(),
+            cpu_ai.segment, cpu_ai.target_y,
+            player_ai is not None,
+            player_ai.segment if player_ai is not None else -1,
+            player_ai.target_y if player_ai is not None else 0.0,
+        )
+
+    def snapshot(self):
+        """
+        Returns the match state as bytes; restore() puts it back exactly.
+        """
+        buffer = bytearray(GAME_STATE.size)
+        self.snapshot_into(buffer)
+        return bytes(buffer)
+
+    def restore(self, buffer, offset=0):
+        """
+        Puts the match back into the state snapshotted at offset in buffer.
+        """
+        state = GAME_STATE.unpack_from(buffer, offset)
+        self.tick, self.rng.state, self.player_score, self.cpu_score, self.segment = state[:5]
+        self.player.restore(state[5:7])
+        self.cpu.restore(state[7:9])
+        self.ball.restore(state[9:17])
+        self.cpu_ai.segment, self.cpu_ai.target_y = state[17:19]
+        has_player_ai, player_ai_segment, player_ai_target = state[19:]
+        if has_player_ai:
+            if self.player_ai is None:
+                self.player_ai = PaddleAI(self.player, self.difficulty, side=-1)
+            self.player_ai.segment = player_ai_segment
+            self.player_ai.target_y = player_ai_target
+        else:
+            self.player_ai = None
+
+# --------------- Rewind ---------------
+class RewindBuffer:
+    """
+    The last capacity ticks of a match, kept as GameCore snapshots in one
+    preallocated bytearray: push() costs a single struct.pack_into and
+    never allocates, and rewind() restores an earlier tick exactly.
+    """
+    __slots__ = ("capacity", "data", "head", "count")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = bytearray(capacity * GAME_STATE.size)
+        self.head = 0     # Slot the next snapshot goes in.
+        self.count = 0    # Snapshots held, up to capacity.
+
+    def clear(self):
+        self.head = self.count = 0
+
+    def push(self, game):
+        """
+        Records the game as it is now; call it right before each step.
+        The oldest snapshot is overwritten once the buffer is full.
+        """
+        game.snapshot_into(self.data, self.head * GAME_STATE.size)
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def rewind(self, game, ticks=1):
+        """
+        Restores the game to the snapshot pushed ticks pushes ago (or the
+        oldest one held) and forgets the newer ones. Returns the number of
+        ticks actually rewound.
+        """
+        ticks = min(ticks, self.count)
+        if ticks <= 0:
+            return 0
+        self.head = (self.head - ticks) % self.capacity
+        self.count -= ticks
+        game.restore(self.data, self.head * GAME_STATE.size)
+        return ticks
@@ -0,0 +1,337 @@
+"""
+Vectorized Gym-style training environment for PyPong.
+
+VecPongEnv runs K matches in which the learning agent plays the right
+(CPU) paddle against the built-in AI on the left, the job the CPU AI does
+in the game. The K environments are split across worker processes, each of
+which steps its slice with one pong_batch.BatchSim, so every step is a
+handful of NumPy operations per worker rather than K Python calls.
+
+Actions, observations, rewards and done flags all live in one block of
+shared memory that the parent and the workers map as NumPy arrays; a step
+sends each worker a one-word command through a pipe and nothing else is
+pickled.
+
+    env = VecPongEnv(1024, num_workers=4)
+    obs = env.reset(seed=0)
+    obs, rewards, terminated, truncated, infos = env.step(actions)
+
+An action is an input word for the paddle: ACTION_STAY, ACTION_UP or
+ACTION_DOWN. The reward is +1 when the agent scores and -1 when the left
+paddle does. Environments that finish are reset automatically; the
+observation returned for them is the first of the next episode.
+
+Requires NumPy.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import pong_core
+from pong_core import WIDTH, HEIGHT, TICK_RATE, INPUT_UP, INPUT_DOWN, PADDLE_WIDTH, PADDLE_HEIGHT, PLAYER_X, CPU_X, BALL_RADIUS
+from pong_batch import BatchSim
+
+# Actions.
+ACTION_STAY = 0
+ACTION_UP   = INPUT_UP
+ACTION_DOWN = INPUT_DOWN
+NUM_ACTIONS = 3
+
+# Observation vector: ball x, y, dx, dy, own paddle y, opponent paddle y,
+# positions scaled to [0, 1] of the field and velocities to BALL_VELOCITY_SCALE.
+OBS_SIZE = 6
+BALL_VELOCITY_SCALE = 20.0
+MAX_EPISODE_STEPS = 20000      # Steps before an episode is truncated.
+FRAME_SCALE = 10               # Downsampling factor of the optional frame observation.
+
+# Commands sent to workers.
+CMD_RESET = "reset"
+CMD_STEP  = "step"
+CMD_CLOSE = "close"
+
+def buffer_layout(num_envs, frame_shape=None):
+    """
+    Returns ([(name, shape, dtype, offset)], total size) for the shared
+    buffers of num_envs environments.
+    """
+    arrays = [
+        ("obs", (num_envs, OBS_SIZE), np.float32),
+        ("actions", (num_envs,), np.uint8),
+        ("rewards", (num_envs,), np.float32),
+        ("terminated", (num_envs,), np.bool_),
+        ("truncated", (num_envs,), np.bool_),
+        ("player_score", (num_envs,), np.int32),
+        ("cpu_score", (num_envs,), np.int32),
+    ]
+    if frame_shape is not None:
+        arrays.append(("frames", (num_envs,) + frame_shape, np.uint8))
+    layout = []
+    offset = 0
+    for name, shape, dtype in arrays:
+        layout.append((name, shape, np.dtype(dtype).str, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8   # Keep every array 8-byte aligned.
+    return layout, max(offset, 1)
+
+def map_buffers(buf, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset) for name, shape, dtype, offset in layout}
+
+# --------------- Environment Slice ---------------
+class EnvSlice:
+    """
+    Environments lo..hi of the shared buffers, stepped with one BatchSim.
+    Runs inside a worker process, or in the parent when num_workers is 0.
+    """
+    def __init__(self, buffers, lo, hi, seed=0, difficulty="normal", tick_rate=TICK_RATE,
+                 max_episode_steps=MAX_EPISODE_STEPS, frame_scale=None):
+        self.n = hi - lo
+        self.views = {name: array[lo:hi] for name, array in buffers.items()}
+        self.difficulty = difficulty
+        self.tick_rate = tick_rate
+        self.max_episode_steps = max_episode_steps
+        self.frame_scale = frame_scale
+        self.seeder = pong_core.Rng(seed * 1000003 + lo)
+        self.sim = BatchSim(self.n, self.seeds(self.n), tick_rate, difficulty)
+        self.steps = np.zeros(self.n, dtype=np.int64)
+        if frame_scale:
+            frame_h, frame_w = self.views["frames"].shape[1:]
+            self.frame_rows = np.arange(frame_h) * frame_scale
+            self.player_cols = np.arange(PLAYER_X // frame_scale, -(-(PLAYER_X + PADDLE_WIDTH) // frame_scale))
+            self.cpu_cols = np.arange(CPU_X // frame_scale, -(-(CPU_X + PADDLE_WIDTH) // frame_scale))
+            self.ball_cells = -(-2 * BALL_RADIUS // frame_scale) + 1   # Most cells the ball spans per axis.
+            self.env_index = np.arange(self.n)
+
+    def seeds(self, count):
+        return [self.seeder.next_u64() for _ in range(count)]
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seeder = pong_core.Rng(seed)
+        self.sim = BatchSim(self.n, self.seeds(self.n), self.tick_rate, self.difficulty)
+        self.steps[:] = 0
+        self.views["rewards"][:] = 0
+        self.views["terminated"][:] = False
+        self.views["truncated"][:] = False
+        self.observe()
+
+    def step(self):
+        sim = self.sim
+        views = self.views
+        player_score = sim.player_score.copy()
+        cpu_score = sim.cpu_score.copy()
+        sim.step(None, views["actions"])
+        views["rewards"][:] = (sim.cpu_score - cpu_score) - (sim.player_score - player_score)
+        views["player_score"][:] = sim.player_score
+        views["cpu_score"][:] = sim.cpu_score
+        self.steps += 1
+        terminated = ~sim.active()
+        truncated = (self.steps >= self.max_episode_steps) & ~terminated
+        views["terminated"][:] = terminated
+        views["truncated"][:] = truncated
+        done = terminated | truncated
+        if done.any():
+            sim.reset(done, self.seeds(int(np.count_nonzero(done))))
+            self.steps[done] = 0
+        self.observe()
+
+    def observe(self):
+        sim = self.sim
+        obs = self.views["obs"]
+        obs[:, 0] = sim.ball_x / WIDTH
+        obs[:, 1] = sim.ball_y / HEIGHT
+        obs[:, 2] = sim.ball_dx / BALL_VELOCITY_SCALE
+        obs[:, 3] = sim.ball_dy / BALL_VELOCITY_SCALE
+        obs[:, 4] = sim.cpu_y / HEIGHT
+        obs[:, 5] = sim.player_y / HEIGHT
+        if self.frame_scale:
+            self.render_frames()
+
+    def render_frames(self):
+        """
+        Draws a downsampled picture of every match: a frame cell is lit if
+        a paddle or the ball overlaps it.
+        """
+        sim = self.sim
+        scale = self.frame_scale
+        frames = self.views["frames"]
+        frame_h, frame_w = frames.shape[1:]
+        rows = self.frame_rows
+        frames[:] = 0
+        # Paddles: whole columns, lit where each paddle's rows overlap a cell.
+        for y, cols in ((sim.player_y, self.player_cols), (sim.cpu_y, self.cpu_cols)):
+            lit = (rows[None, :] + scale > y[:, None]) & (rows[None, :] < (y + PADDLE_HEIGHT)[:, None])
+            frames[:, :, cols] = lit[:, :, None] * np.uint8(255)
+        # Ball: the few cells its bounding box overlaps.
+        row_lo = np.floor((sim.ball_y - BALL_RADIUS) / scale).astype(np.int64)
+        row_hi = np.ceil((sim.ball_y + BALL_RADIUS) / scale).astype(np.int64)
+        col_lo = np.floor((sim.ball_x - BALL_RADIUS) / scale).astype(np.int64)
+        col_hi = np.ceil((sim.ball_x + BALL_RADIUS) / scale).astype(np.int64)
+        for dr in range(self.ball_cells):
+            r = row_lo + dr
+            for dc in range(self.ball_cells):
+                c = col_lo + dc
+                valid = (r < row_hi) & (c < col_hi) & (r >= 0) & (r < frame_h) & (c >= 0) & (c < frame_w)
+                frames[self.env_index[valid], r[valid], c[valid]] = 255
+
+def run_worker(conn, shm_name, layout, lo, hi, settings):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffers = map_buffers(shm.buf, layout)
+        env = EnvSlice(buffers, lo, hi, **settings)
+        while True:
+            command, arg = conn.recv()
+            if command == CMD_STEP:
+                env.step()
+            elif command == CMD_RESET:
+                env.reset(arg)
+            elif command == CMD_CLOSE:
+                break
+            conn.send(None)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # The NumPy views must go before the mapping can be closed.
+        env = buffers = None
+        shm.close()
+
+# --------------- Vectorized Environment ---------------
+class VecPongEnv:
+    """
+    num_envs matches stepped in lockstep across num_workers processes (one
+    per core by default; 0 steps everything in this process).
+    Pass frames=True to also get a downsampled (HEIGHT / FRAME_SCALE,
+    WIDTH / FRAME_SCALE) uint8 picture of every match in infos["frames"].
+    The arrays returned by reset() and step() are views of shared memory
+    that the next step overwrites; copy them to keep them.
+    """
+    def __init__(self, num_envs, num_workers=None, frames=False, frame_scale=FRAME_SCALE, seed=0,
+                 difficulty="normal", tick_rate=TICK_RATE, max_episode_steps=MAX_EPISODE_STEPS):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers, num_envs)
+        self.observation_shape = (OBS_SIZE,)
+        self.num_actions = NUM_ACTIONS
+        self.frame_shape = (HEIGHT // frame_scale, WIDTH // frame_scale) if frames else None
+        layout, size = buffer_layout(num_envs, self.frame_shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.buffers = map_buffers(self.shm.buf, layout)
+        settings = {
+            "seed": seed, "difficulty": difficulty, "tick_rate": tick_rate,
+            "max_episode_steps": max_episode_steps, "frame_scale": frame_scale if frames else None,
+        }
+        bounds = np.linspace(0, num_envs, max(self.num_workers, 1) + 1).astype(int)
+        self.local = None
+        self.workers = []
+        if self.num_workers == 0:
+            self.local = EnvSlice(self.buffers, 0, num_envs, **settings)
+        else:
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=run_worker, args=(child, self.shm.name, layout, int(lo), int(hi), settings), daemon=True,
+                )
+                process.start()
+                child.close()
+                self.workers.append((process, parent))
+        self.closed = False
+
+    def _command(self, command, arg=None):
+        if self.local is not None:
+            if command == CMD_STEP:
+                self.local.step()
+            else:
+                self.local.reset(arg)
+            return
+        for _, conn in self.workers:
+            conn.send((command, arg))
+        for _, conn in self.workers:
+            conn.recv()
+
+    def infos(self):
+        infos = {"player_score": self.buffers["player_score"], "cpu_score": self.buffers["cpu_score"]}
+        if self.frame_shape is not None:
+            infos["frames"] = self.buffers["frames"]
+        return infos
+
+    def reset(self, seed=None):
+        """
+        Starts every environment over and returns the observations.
+        Worker i is reseeded with seed + i if a seed is given.
+        """
+        if self.local is not None:
+            self.local.reset(seed)
+        else:
+            for i, (_, conn) in enumerate(self.workers):
+                conn.send((CMD_RESET, None if seed is None else seed + i))
+            for _, conn in self.workers:
+                conn.recv()
+        return self.buffers["obs"]
+
+    def step(self, actions):
+        """
+        Applies one action per environment and advances them all one tick.
+        Returns (obs, rewards, terminated, truncated, infos).
+        """
+        self.buffers["actions"][:] = actions
+        self._command(CMD_STEP)
+        b = self.buffers
+        return b["obs"], b["rewards"], b["terminated"], b["truncated"], self.infos()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for process, conn in self.workers:
+            try:
+                conn.send((CMD_CLOSE, None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self.workers:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.local = None
+        self.buffers = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --------------- Throughput ---------------
+def measure_throughput(num_envs=4096, num_workers=None, steps=500, frames=False):
+    """
+    Steps random actions and returns environment steps per second.
+    """
+    with VecPongEnv(num_envs, num_workers, frames=frames) as env:
+        env.reset(seed=0)
+        rng = np.random.default_rng(0)
+        actions = rng.integers(0, NUM_ACTIONS, size=(steps, num_envs), dtype=np.uint8)
+        env.step(actions[0])
+        start = time.perf_counter()
+        for i in range(steps):
+            env.step(actions[i])
+        elapsed = time.perf_counter() - start
+    return num_envs * steps / elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure VecPongEnv throughput with random actions.")
+    parser.add_argument("--envs", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core; 0 for none).")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--frames", action="store_true", help="Also render frame observations.")
+    args = parser.parse_args(argv)
+    rate = measure_throughput(args.envs, args.workers, args.steps, args.frames)
+    print(f"{args.envs} envs: {rate:,.0f} steps/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,726 @@
+"""
+Two-player network play for PyPong over UDP, built on asyncio.
+
+The server runs the only real simulation (a pong_core.GameCore with both
+paddles driven by players' inputs) at a fixed tick rate and sends every
+client a state snapshot each tick. Snapshots are delta-compressed against
+the newest snapshot the client has acknowledged, so a typical one carries
+just the ball and whichever paddle moved.
+
+Clients send one input word per tick, repeating their last few inputs in
+every packet so a lost packet costs nothing. They predict their own paddle
+locally (apply the input immediately, then replay unacknowledged inputs on
+top of each authoritative snapshot) and draw the other paddle and the ball
+interpolated between snapshots, INTERP_DELAY behind the server.
+
+Both ends keep NetStats (round-trip time, jitter, packet loss, bytes) and
+can send through a LinkConditioner that adds latency, jitter and loss, so
+the whole thing can be exercised on one machine:
+
+    python pong_net.py server --port 50007
+    python pong.py --connect 127.0.0.1:50007          # Once per player.
+    python pong_net.py harness --latency 60 --jitter 10 --loss 0.05
+"""
+import argparse
+import asyncio
+import collections
+import struct
+import sys
+import time
+
+import pong_core
+from pong_core import (
+    BASE_TICK_RATE, TICK_RATE, INPUT_UP, INPUT_DOWN,
+    EVENT_WALL_BOUNCE, EVENT_PADDLE_HIT, EVENT_PLAYER_SCORED, EVENT_CPU_SCORED,
+)
+
+# --------------- Global Variables and Constants ---------------
+DEFAULT_PORT = 50007
+PROTOCOL_VERSION = 1
+
+INPUT_REDUNDANCY = 8       # Input words repeated in every input packet.
+INPUT_BUFFER_MAX = 4       # Queued inputs the server keeps before skipping ahead.
+SNAPSHOT_HISTORY = 64      # Snapshots kept on both ends as delta baselines.
+INTERP_DELAY = 0.1         # Seconds clients draw remote objects behind the server.
+PEER_TIMEOUT = 5.0         # Seconds of silence before the server drops a client.
+HELLO_INTERVAL = 0.5       # Seconds between a client's join attempts.
+RESTART_DELAY = 3.0        # Seconds a finished match is shown before the next one starts.
+
+# Sides a client can play.
+SIDE_LEFT  = 0     # GameCore.player
+SIDE_RIGHT = 1     # GameCore.cpu
+
+# Match status carried in snapshots.
+STATUS_WAITING = 0    # Waiting for both players.
+STATUS_PLAYING = 1
+STATUS_OVER    = 2
+
+# Packet types.
+PACKET_HELLO    = 1
+PACKET_WELCOME  = 2
+PACKET_FULL     = 3
+PACKET_INPUT    = 4
+PACKET_SNAPSHOT = 5
+PACKET_BYE      = 6
+
+HELLO    = struct.Struct("<BB")       # type, protocol version
+WELCOME  = struct.Struct("<BBH")      # type, side, tick rate
+# type, newest snapshot received, client send time (ms), newest input seq,
+# number of input words that follow (one byte each, oldest first).
+INPUT    = struct.Struct("<BIdIB")
+# type, snapshot frame, baseline frame (0 for a full snapshot), newest input
+# applied, echoed client send time (ms), ms the server held that echo,
+# mask of the fields that follow.
+SNAPSHOT = struct.Struct("<BIIIdfH")
+TYPE     = struct.Struct("<B")
+
+# Snapshot fields and how each one is packed.
+NetState = collections.namedtuple("NetState", (
+    "player_y", "cpu_y", "ball_x", "ball_y", "ball_dx", "ball_dy", "hit_flash",
+    "player_score", "cpu_score", "status",
+))
+FIELD_STRUCTS = [struct.Struct("<" + code) for code in "fffffffHHB"]
+_F32 = struct.Struct("<f")
+
+def f32(value):
+    """Rounds a float to what survives being sent as a float32."""
+    return _F32.unpack(_F32.pack(value))[0]
+
+def game_state(game, status):
+    player, cpu, ball = game.player, game.cpu, game.ball
+    return NetState(
+        f32(player.y), f32(cpu.y), f32(ball.x), f32(ball.y), f32(ball.dx), f32(ball.dy), f32(ball.hit_flash),
+        game.player_score, game.cpu_score, status,
+    )
+
+def encode_state(state, baseline=None):
+    """
+    Returns (mask, payload) for the fields of state that differ from
+    baseline, or all of them if there is no baseline.
+    """
+    mask = 0
+    parts = []
+    for i, value in enumerate(state):
+        if baseline is None or baseline[i] != value:
+            mask |= 1 << i
+            parts.append(FIELD_STRUCTS[i].pack(value))
+    return mask, b"".join(parts)
+
+def decode_state(mask, data, offset, baseline=None):
+    values = list(baseline) if baseline is not None else [0] * len(FIELD_STRUCTS)
+    for i, field in enumerate(FIELD_STRUCTS):
+        if mask & (1 << i):
+            values[i] = field.unpack_from(data, offset)[0]
+            offset += field.size
+    return NetState(*values)
+
+def now_ms():
+    return time.perf_counter() * 1000.0
+
+# --------------- Instrumentation ---------------
+class NetStats:
+    """
+    Traffic counters for one end of a connection.
+    Round-trip time and jitter are smoothed like TCP's estimators; loss is
+    worked out from gaps in the sequence numbers of received packets.
+    """
+    def __init__(self):
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rtt = None
+        self.jitter = 0.0
+        self.first_seq = None
+        self.last_seq = None
+        self.sequenced = 0
+        self.corrections = 0
+        self.correction_total = 0.0
+        self.correction_max = 0.0
+
+    def sent(self, size):
+        self.packets_sent += 1
+        self.bytes_sent += size
+
+    def received(self, size):
+        self.packets_received += 1
+        self.bytes_received += size
+
+    def sequence(self, seq):
+        """Counts a packet carrying sequence number seq towards the loss figure."""
+        if self.first_seq is None:
+            self.first_seq = seq
+        if self.last_seq is None or seq > self.last_seq:
+            self.last_seq = seq
+        self.sequenced += 1
+
+    def add_rtt(self, sample):
+        if self.rtt is None:
+            self.rtt = sample
+            self.jitter = sample / 2
+        else:
+            self.jitter += (abs(sample - self.rtt) - self.jitter) / 4
+            self.rtt += (sample - self.rtt) / 8
+
+    def add_correction(self, distance):
+        """Records how far a prediction was off when the server's state came in."""
+        self.corrections += 1
+        self.correction_total += distance
+        self.correction_max = max(self.correction_max, distance)
+
+    @property
+    def loss(self):
+        if self.first_seq is None:
+            return 0.0
+        expected = self.last_seq - self.first_seq + 1
+        return max(0.0, 1.0 - self.sequenced / expected)
+
+    def summary(self):
+        rtt = f"{self.rtt:.1f}" if self.rtt is not None else "-"
+        return f"rtt {rtt} ms (jitter {self.jitter:.1f}), loss {self.loss * 100:.1f}%, " \
+               f"sent {self.packets_sent} ({self.bytes_sent} B), received {self.packets_received} ({self.bytes_received} B)"
+
+class LinkConditioner:
+    """
+    Sends datagrams as if over a worse network: each one is dropped with
+    probability loss, otherwise delivered after latency_ms plus up to
+    jitter_ms either way (which also reorders them).
+    """
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, loss=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.rng = pong_core.Rng(seed)
+        self.dropped = 0
+
+    def send(self, transport, data, addr=None):
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else self.latency_ms
+        if delay <= 0:
+            transport.sendto(data, addr)
+        else:
+            asyncio.get_running_loop().call_later(delay / 1000.0, self._deliver, transport, data, addr)
+
+    @staticmethod
+    def _deliver(transport, data, addr):
+        if not transport.is_closing():
+            transport.sendto(data, addr)
+
+# --------------- Server ---------------
+class Peer:
+    """
+    The server's view of one connected client.
+    """
+    def __init__(self, addr, side):
+        self.addr = addr
+        self.side = side
+        self.inputs = {}         # Input words received but not applied yet, by seq.
+        self.next_seq = 1        # Seq of the next input to apply.
+        self.last_input = 0      # Reused on ticks where no input has arrived.
+        self.ack_frame = 0       # Newest snapshot the client has received.
+        self.echo_time = 0.0     # Client send time of its newest input packet...
+        self.echo_received = 0.0 # ...and when it arrived (both in ms).
+        self.last_heard = time.perf_counter()
+        self.stats = NetStats()
+
+    def next_input(self):
+        inputs = self.inputs
+        if inputs:
+            oldest = min(inputs)
+            if oldest > self.next_seq:
+                self.next_seq = oldest  # Every copy of the inputs in between was lost.
+            while len(inputs) > INPUT_BUFFER_MAX:
+                # The client is running ahead of the server; catch up.
+                inputs.pop(self.next_seq, None)
+                self.next_seq += 1
+        word = inputs.pop(self.next_seq, None)
+        if word is not None:
+            self.last_input = word
+            self.next_seq += 1
+        return self.last_input
+
+    def skip_inputs(self):
+        # Inputs sent while the match isn't running are never applied.
+        self.inputs.clear()
+        self.last_input = 0
+        if self.stats.last_seq is not None:
+            self.next_seq = self.stats.last_seq + 1
+
+class NetServer(asyncio.DatagramProtocol):
+    """
+    Hosts one two-player match.
+    Use as the protocol of a datagram endpoint and run run() as a task.
+    """
+    def __init__(self, tick_rate=TICK_RATE, conditioner=None, seed=None):
+        self.tick_rate = tick_rate
+        self.conditioner = conditioner
+        self.seed = seed
+        self.transport = None
+        self.peers = {}
+        self.game = pong_core.GameCore(seed=seed, tick_rate=tick_rate)
+        self.status = STATUS_WAITING
+        self.over_frames = 0
+        self.frame = 0
+        self.history = collections.OrderedDict()
+        self.running = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, data, addr, stats=None):
+        if stats is not None:
+            stats.sent(len(data))
+        if self.conditioner is not None:
+            self.conditioner.send(self.transport, data, addr)
+        else:
+            self.transport.sendto(data, addr)
+
+    def datagram_received(self, data, addr):
+        try:
+            kind = data[0]
+            peer = self.peers.get(addr)
+            if peer is not None:
+                peer.stats.received(len(data))
+                peer.last_heard = time.perf_counter()
+            if kind == PACKET_HELLO:
+                self.on_hello(data, addr, peer)
+            elif kind == PACKET_INPUT and peer is not None:
+                self.on_input(data, peer)
+            elif kind == PACKET_BYE and peer is not None:
+                self.drop(peer)
+        except (IndexError, struct.error) as e:
+            print(f"[NET] Bad packet from {addr}: {e}")
+
+    def on_hello(self, data, addr, peer):
+        _, version = HELLO.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            return
+        if peer is None:
+            taken = {p.side for p in self.peers.values()}
+            free = [side for side in (SIDE_LEFT, SIDE_RIGHT) if side not in taken]
+            if not free:
+                self.send(TYPE.pack(PACKET_FULL), addr)
+                return
+            peer = self.peers[addr] = Peer(addr, free[0])
+        self.send(WELCOME.pack(PACKET_WELCOME, peer.side, self.tick_rate), addr, peer.stats)
+
+    def on_input(self, data, peer):
+        _, ack_frame, send_time, seq, count = INPUT.unpack_from(data)
+        words = data[INPUT.size:INPUT.size + count]
+        peer.stats.sequence(seq)
+        if ack_frame > peer.ack_frame:
+            peer.ack_frame = ack_frame
+        if send_time > peer.echo_time:
+            peer.echo_time = send_time
+            peer.echo_received = now_ms()
+        first = seq - len(words) + 1
+        for i, word in enumerate(words):
+            if first + i >= peer.next_seq:
+                peer.inputs[first + i] = word
+
+    def drop(self, peer):
+        del self.peers[peer.addr]
+        if self.status == STATUS_PLAYING:
+            self.status = STATUS_WAITING
+
+    def tick(self):
+        """
+        Advances the server by one tick: steps the match if both players
+        are in and sends everyone a snapshot.
+        """
+        self.frame += 1
+        now = time.perf_counter()
+        for peer in list(self.peers.values()):
+            if now - peer.last_heard > PEER_TIMEOUT:
+                print(f"[NET] {peer.addr} timed out")
+                self.drop(peer)
+
+        sides = {peer.side: peer for peer in self.peers.values()}
+        if self.status == STATUS_OVER:
+            self.over_frames += 1
+            if self.over_frames >= RESTART_DELAY * self.tick_rate:
+                self.game = pong_core.GameCore(seed=self.seed, tick_rate=self.tick_rate)
+                self.status = STATUS_WAITING
+        if self.status == STATUS_WAITING and len(sides) == 2:
+            self.status = STATUS_PLAYING
+        if self.status == STATUS_PLAYING:
+            left = sides[SIDE_LEFT].next_input()
+            right = sides[SIDE_RIGHT].next_input()
+            self.game.step(left, right)
+            if self.game.winner() is not None:
+                self.status = STATUS_OVER
+                self.over_frames = 0
+        else:
+            for peer in self.peers.values():
+                peer.skip_inputs()
+
+        state = game_state(self.game, self.status)
+        self.history[self.frame] = state
+        while len(self.history) > SNAPSHOT_HISTORY:
+            self.history.popitem(last=False)
+        received = now_ms()
+        for peer in self.peers.values():
+            baseline = self.history.get(peer.ack_frame)
+            baseline_frame = peer.ack_frame if baseline is not None else 0
+            mask, payload = encode_state(state, baseline)
+            header = SNAPSHOT.pack(
+                PACKET_SNAPSHOT, self.frame, baseline_frame, peer.next_seq - 1,
+                peer.echo_time, received - peer.echo_received if peer.echo_time else 0.0, mask,
+            )
+            self.send(header + payload, peer.addr, peer.stats)
+
+    async def run(self):
+        """
+        Ticks at tick_rate until stop() is called.
+        """
+        loop = asyncio.get_running_loop()
+        tick_time = 1.0 / self.tick_rate
+        next_time = loop.time()
+        self.running = True
+        while self.running:
+            self.tick()
+            next_time += tick_time
+            delay = next_time - loop.time()
+            if delay < -tick_time * 5:
+                next_time = loop.time()  # Far behind: drop the backlog rather than spiral.
+            await asyncio.sleep(max(0.0, delay))
+
+    def stop(self):
+        self.running = False
+
+# --------------- Client ---------------
+class NetClient(asyncio.DatagramProtocol):
+    """
+    One player's end of a match.
+    Call send_input() once per tick with the player's input word and draw
+    from view(). The local paddle is predicted; the other paddle and the
+    ball are interpolated between snapshots.
+    """
+    def __init__(self, conditioner=None, interp_delay=INTERP_DELAY):
+        self.conditioner = conditioner
+        self.interp_delay = interp_delay
+        self.transport = None
+        self.side = None
+        self.tick_rate = TICK_RATE
+        self.step_scale = 1.0
+        self.paddle = None
+        self.seq = 0
+        self.pending = collections.deque()   # (seq, input word) not yet applied by the server.
+        self.recent = collections.deque(maxlen=INPUT_REDUNDANCY)
+        self.states = collections.OrderedDict()
+        self.latest_frame = 0
+        self.latest_time = 0.0
+        self.last_hello = None
+        self.full = False
+        self.events = 0
+        self.stats = NetStats()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.hello()
+
+    def send(self, data):
+        self.stats.sent(len(data))
+        if self.conditioner is not None:
+            self.conditioner.send(self.transport, data)
+        else:
+            self.transport.sendto(data)
+
+    def hello(self):
+        self.last_hello = time.perf_counter()
+        self.send(HELLO.pack(PACKET_HELLO, PROTOCOL_VERSION))
+
+    def close(self):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(TYPE.pack(PACKET_BYE))
+            self.transport.close()
+
+    def datagram_received(self, data, addr):
+        self.stats.received(len(data))
+        try:
+            kind = data[0]
+            if kind == PACKET_SNAPSHOT:
+                self.on_snapshot(data)
+            elif kind == PACKET_WELCOME:
+                self.on_welcome(data)
+            elif kind == PACKET_FULL:
+                self.full = True
+        except (IndexError, struct.error) as e:
+            print(f"[NET] Bad packet from server: {e}")
+
+    def on_welcome(self, data):
+        _, side, tick_rate = WELCOME.unpack_from(data)
+        if self.side is not None:
+            return
+        self.side = side
+        self.tick_rate = tick_rate
+        self.step_scale = BASE_TICK_RATE / tick_rate
+        x = pong_core.PLAYER_X if side == SIDE_LEFT else pong_core.CPU_X
+        self.paddle = pong_core.Paddle(x, pong_core.HEIGHT // 2 - pong_core.PADDLE_HEIGHT // 2)
+
+    def on_snapshot(self, data):
+        _, frame, baseline_frame, ack_seq, echo_time, hold, mask = SNAPSHOT.unpack_from(data)
+        if frame in self.states:
+            return
+        baseline = None
+        if baseline_frame:
+            baseline = self.states.get(baseline_frame)
+            if baseline is None:
+                return  # Its baseline has already been forgotten; a newer snapshot will do.
+        state = decode_state(mask, data, SNAPSHOT.size, baseline)
+        self.stats.sequence(frame)
+        self.states[frame] = state
+        if frame < self.latest_frame:
+            # Arrived out of order: keep it for interpolation, in frame order.
+            self.states = collections.OrderedDict(sorted(self.states.items()))
+        while len(self.states) > SNAPSHOT_HISTORY:
+            self.states.popitem(last=False)
+        if frame < self.latest_frame:
+            return
+        if echo_time:
+            self.stats.add_rtt(now_ms() - echo_time - hold)
+        if self.latest_frame in self.states:
+            self.events |= self.detect_events(self.states[self.latest_frame], state)
+        self.latest_frame = frame
+        self.latest_time = time.perf_counter()
+        self.reconcile(state, ack_seq)
+
+    def reconcile(self, state, ack_seq):
+        """
+        Moves the predicted paddle to where the server has it and replays
+        the inputs the server has not applied yet on top.
+        """
+        if self.paddle is None:
+            return
+        predicted = self.paddle.y
+        self.paddle.y = state.player_y if self.side == SIDE_LEFT else state.cpu_y
+        while self.pending and self.pending[0][0] <= ack_seq:
+            self.pending.popleft()
+        for _, word in self.pending:
+            self.paddle.apply_input(word, self.step_scale)
+        if state.status == STATUS_PLAYING:
+            self.stats.add_correction(abs(self.paddle.y - predicted))
+
+    @staticmethod
+    def detect_events(old, new):
+        """
+        Works out EVENT_* bits from two consecutive snapshots, for sounds.
+        """
+        events = 0
+        if new.player_score > old.player_score:
+            events |= EVENT_PLAYER_SCORED
+        elif new.cpu_score > old.cpu_score:
+            events |= EVENT_CPU_SCORED
+        else:
+            if (new.ball_dx > 0) != (old.ball_dx > 0):
+                events |= EVENT_PADDLE_HIT
+            if (new.ball_dy > 0) != (old.ball_dy > 0):
+                events |= EVENT_WALL_BOUNCE
+        return events
+
+    def take_events(self):
+        events, self.events = self.events, 0
+        return events
+
+    def send_input(self, input_word):
+        """
+        Runs one client tick: predicts the local paddle for the input and
+        sends it to the server along with the previous few.
+        """
+        if self.side is None:
+            if time.perf_counter() - self.last_hello > HELLO_INTERVAL:
+                self.hello()
+            return
+        self.seq += 1
+        input_word &= INPUT_UP | INPUT_DOWN
+        latest = self.states.get(self.latest_frame)
+        if latest is not None and latest.status == STATUS_PLAYING:
+            self.pending.append((self.seq, input_word))
+            self.paddle.apply_input(input_word, self.step_scale)
+        self.recent.append(input_word)
+        packet = INPUT.pack(PACKET_INPUT, self.latest_frame, now_ms(), self.seq, len(self.recent)) + bytes(self.recent)
+        self.send(packet)
+
+    def view(self, now=None):
+        """
+        Returns the NetState to draw: remote objects interpolated
+        interp_delay behind the newest snapshot, the local paddle predicted.
+        None until the first snapshot arrives.
+        """
+        if not self.states:
+            return None
+        if now is None:
+            now = time.perf_counter()
+        render_frame = self.latest_frame + (now - self.latest_time - self.interp_delay) * self.tick_rate
+        older = newer = None
+        for frame in reversed(self.states):
+            if frame <= render_frame:
+                older = frame
+                break
+            newer = frame
+        if older is None:
+            state = self.states[newer]
+        elif newer is None:
+            state = self.states[older]
+        else:
+            a, b = self.states[older], self.states[newer]
+            if a.player_score != b.player_score or a.cpu_score != b.cpu_score:
+                state = b  # The ball was served in between; don't sweep it across the field.
+            else:
+                t = (render_frame - older) / (newer - older)
+                state = b._replace(**{
+                    name: getattr(a, name) + (getattr(b, name) - getattr(a, name)) * t
+                    for name in ("player_y", "cpu_y", "ball_x", "ball_y", "hit_flash")
+                })
+        if self.paddle is not None:
+            if self.side == SIDE_LEFT:
+                state = state._replace(player_y=self.paddle.y)
+            else:
+                state = state._replace(cpu_y=self.paddle.y)
+        return state
+
+async def connect(host, port=DEFAULT_PORT, conditioner=None):
+    """
+    Opens a NetClient to a server and returns it.
+    """
+    loop = asyncio.get_running_loop()
+    client = NetClient(conditioner)
+    await loop.create_datagram_endpoint(lambda: client, remote_addr=(host, port))
+    return client
+
+def pump(loop, client, limit=64):
+    """
+    Runs an event loop that is not otherwise running just long enough to
+    handle every datagram that has arrived for client, so a game that owns
+    its frame loop can do its networking on the same thread, once a frame.
+    """
+    for _ in range(limit):
+        received = client.stats.packets_received
+        loop.stop()
+        loop.run_forever()  # Polls once without blocking, since stop() came first.
+        if client.stats.packets_received == received:
+            break
+
+async def serve(host="0.0.0.0", port=DEFAULT_PORT, tick_rate=TICK_RATE, conditioner=None):
+    """
+    Runs a NetServer until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    server = NetServer(tick_rate, conditioner)
+    transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=(host, port))
+    print(f"[NET] Serving on {transport.get_extra_info('sockname')}")
+    try:
+        await server.run()
+    finally:
+        transport.close()
+
+# --------------- Lag Test Harness ---------------
+def bot_input(client):
+    """
+    A simple player for the harness: follows the ball it sees.
+    """
+    state = client.view()
+    if state is None or client.paddle is None:
+        return 0
+    centery = client.paddle.centery
+    if state.ball_y < centery - 10:
+        return INPUT_UP
+    if state.ball_y > centery + 10:
+        return INPUT_DOWN
+    return 0
+
+async def run_harness(seconds=5.0, latency_ms=50.0, jitter_ms=5.0, loss=0.02, seed=1, tick_rate=TICK_RATE):
+    """
+    Plays two bot clients against each other through a server on
+    localhost, with every packet in both directions sent through a
+    LinkConditioner. Returns a report of what each end measured.
+    """
+    loop = asyncio.get_running_loop()
+    server = NetServer(tick_rate, LinkConditioner(latency_ms, jitter_ms, loss, seed), seed=seed)
+    server_transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+    port = server_transport.get_extra_info("sockname")[1]
+    server_task = asyncio.create_task(server.run())
+    clients = []
+    for i in range(2):
+        clients.append(await connect("127.0.0.1", port, LinkConditioner(latency_ms, jitter_ms, loss, seed + 1 + i)))
+
+    tick_time = 1.0 / tick_rate
+    start = next_time = loop.time()
+    while loop.time() - start < seconds:
+        for client in clients:
+            client.send_input(bot_input(client))
+        next_time += tick_time
+        await asyncio.sleep(max(0.0, next_time - loop.time()))
+
+    server.stop()
+    await server_task
+
+    full_size = SNAPSHOT.size + sum(field.size for field in FIELD_STRUCTS)
+    report = {
+        "latency_ms": latency_ms, "jitter_ms": jitter_ms, "loss": loss,
+        "server_frames": server.frame, "match_ticks": server.game.tick,
+        "score": (server.game.player_score, server.game.cpu_score),
+        "full_snapshot_bytes": full_size,
+        "clients": [],
+    }
+    peers = {peer.side: peer for peer in server.peers.values()}
+    for client in sorted(clients, key=lambda c: c.side):
+        stats = client.stats
+        peer = peers[client.side]
+        report["clients"].append({
+            "side": client.side,
+            "rtt_ms": stats.rtt,
+            "jitter_ms": stats.jitter,
+            "snapshot_loss": stats.loss,
+            "input_loss": peer.stats.loss,
+            "snapshot_bytes": peer.stats.bytes_sent / max(1, peer.stats.packets_sent),
+            "mean_correction": stats.correction_total / max(1, stats.corrections),
+            "max_correction": stats.correction_max,
+            "summary": stats.summary(),
+        })
+    for client in clients:
+        client.close()
+    server_transport.close()
+    return report
+
+def print_report(report):
+    print(f"Link: {report['latency_ms']} ms +/- {report['jitter_ms']} ms each way, {report['loss'] * 100:.1f}% loss")
+    print(f"Server: {report['server_frames']} frames, {report['match_ticks']} match ticks, score {report['score'][0]} - {report['score'][1]}")
+    for c in report["clients"]:
+        print(f"Client {c['side']}: {c['summary']}")
+        print(f"  input loss at server {c['input_loss'] * 100:.1f}%, "
+              f"{c['snapshot_bytes']:.1f} B per snapshot (full {report['full_snapshot_bytes']} B), "
+              f"prediction corrections mean {c['mean_correction']:.2f} px, max {c['max_correction']:.2f} px")
+
+# --------------- Command Line ---------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyPong network server and lag test harness.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    server = commands.add_parser("server", help="Host a two-player match.")
+    server.add_argument("--host", default="0.0.0.0")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT)
+    harness = commands.add_parser("harness", help="Play two bots over localhost through a simulated bad link.")
+    harness.add_argument("--seconds", type=float, default=5.0)
+    harness.add_argument("--seed", type=int, default=1)
+    for sub in (server, harness):
+        sub.add_argument("--latency", type=float, default=0.0, help="Added one-way latency in ms.")
+        sub.add_argument("--jitter", type=float, default=0.0, help="Random latency variation in ms.")
+        sub.add_argument("--loss", type=float, default=0.0, help="Fraction of packets dropped.")
+    args = parser.parse_args(argv)
+
+    if args.command == "server":
+        conditioner = None
+        if args.latency or args.jitter or args.loss:
+            conditioner = LinkConditioner(args.latency, args.jitter, args.loss)
+        try:
+            asyncio.run(serve(args.host, args.port, conditioner=conditioner))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    print_report(asyncio.run(run_harness(args.seconds, args.latency, args.jitter, args.loss, args.seed)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Compact match replays for PyPong.
+
+A match is fully determined by its seed, tick rate, rules and the player's
+input on every tick, so a replay stores just those: a small header, the
+input words bit-packed two bits per tick and compressed, and a keyframe of
+the whole match state every KEYFRAME_INTERVAL ticks. Playing a replay back
+re-simulates the match with pong_core.GameCore (or a subclass such as
+pong.PongGame); seeking restores the nearest keyframe at or before the
+target tick and simulates only the ticks after it.
+
+    python pong_replay.py last_match.pongreplay            # Summary and playback speed.
+    python pong_replay.py last_match.pongreplay --verify   # Also check it replays exactly.
+"""
+import argparse
+import bisect
+import struct
+import sys
+import time
+import zlib
+
+import pong_core
+from pong_core import INPUT_UP, INPUT_DOWN
+
+REPLAY_MAGIC = b"PPRL"
+REPLAY_VERSION = 1
+KEYFRAME_INTERVAL = 600    # Ticks between keyframes (10 seconds at 60 ticks per second).
+INPUT_BITS = 2             # Bits stored per tick: INPUT_UP and INPUT_DOWN.
+INPUT_MASK = INPUT_UP | INPUT_DOWN
+TICKS_PER_BYTE = 8 // INPUT_BITS
+
+# Header flags.
+FLAG_PLAYER_AI = 1    # The left paddle was steered by the AI, so no inputs are stored.
+
+# magic, version, flags, tick rate, seed, max error, min error, speed factor,
+# winning score, recorded ticks, keyframe interval, keyframe count.
+HEADER = struct.Struct("<4sBBHQdddHIII")
+# A keyframe is a GameCore.snapshot() of the match.
+KEYFRAME = pong_core.GAME_STATE
+
+# --------------- Replay ---------------
+class Replay:
+    """
+    The log of one match: its settings, one input word per tick and
+    keyframes of its state.
+    Record by creating one with Replay.record_from(game) and calling
+    record() with every input right before the game steps on it. Play back
+    by stepping a game from new_game() with player_input(i) for tick i of the
+    recording, or jump anywhere with seek().
+    """
+    def __init__(self, seed, tick_rate, difficulty, winning_score, flags=0, keyframe_interval=KEYFRAME_INTERVAL):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.difficulty = difficulty
+        self.winning_score = winning_score
+        self.flags = flags
+        self.keyframe_interval = keyframe_interval
+        self.tick_count = 0
+        self.inputs = bytearray()
+        self.keyframe_ticks = []
+        self.keyframes = []
+
+    @classmethod
+    def record_from(cls, game, player_ai=False, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Starts recording a match from its current state. Pass player_ai=True
+        if the left paddle is steered by the AI (player_input None).
+        """
+        replay = cls(
+            seed=game.rng.state,
+            tick_rate=game.tick_rate,
+            difficulty=game.difficulty,
+            winning_score=game.winning_score,
+            flags=FLAG_PLAYER_AI if player_ai else 0,
+            keyframe_interval=keyframe_interval,
+        )
+        return replay
+
+    @property
+    def start_tick(self):
+        return self.keyframe_ticks[0] if self.keyframe_ticks else 0
+
+    @property
+    def end_tick(self):
+        return self.start_tick + self.tick_count
+
+    def record(self, game, player_input):
+        """
+        Logs the input for the tick the game is about to step.
+        """
+        index = self.tick_count
+        if index % self.keyframe_interval == 0:
+            self.keyframe_ticks.append(game.tick)
+            self.keyframes.append(game.snapshot())
+        if index % TICKS_PER_BYTE == 0:
+            self.inputs.append(0)
+        if player_input:
+            self.inputs[-1] |= (player_input & INPUT_MASK) << (index % TICKS_PER_BYTE * INPUT_BITS)
+        self.tick_count += 1
+
+    def player_input(self, index):
+        """
+        Returns the input word for tick index of the recording (None when the
+        AI played the left paddle).
+        """
+        if self.flags & FLAG_PLAYER_AI:
+            return None
+        return (self.inputs[index // TICKS_PER_BYTE] >> (index % TICKS_PER_BYTE * INPUT_BITS)) & INPUT_MASK
+
+    def new_game(self, factory=pong_core.GameCore, **kwargs):
+        """
+        Builds a game with the recording's settings, positioned at its start.
+        factory is GameCore or a subclass; kwargs go to its constructor.
+        """
+        game = factory(seed=self.seed, tick_rate=self.tick_rate, **kwargs)
+        game.difficulty = game.cpu_ai.difficulty = self.difficulty
+        game.winning_score = self.winning_score
+        if self.keyframes:
+            game.restore(self.keyframes[0])
+        return game
+
+    def seek(self, game, tick):
+        """
+        Moves a game from new_game() to the given tick: restores the nearest
+        keyframe at or before it and simulates the rest. Returns the tick
+        reached, which is clamped to the recording.
+        """
+        tick = min(max(tick, self.start_tick), self.end_tick)
+        if not self.keyframes:
+            return tick
+        if not game.tick <= tick < game.tick + self.keyframe_interval:
+            # Only restore if that is quicker than stepping forward from here.
+            k = bisect.bisect_right(self.keyframe_ticks, tick) - 1
+            game.restore(self.keyframes[k])
+        self.play(game, tick)
+        return tick
+
+    def play(self, game, until=None):
+        """
+        Steps a game through the recording until the given tick (the end by
+        default) without drawing or sound. Returns the EVENT_* bits of all
+        ticks stepped.
+        """
+        until = self.end_tick if until is None else min(until, self.end_tick)
+        start = self.start_tick
+        events = 0
+        while game.tick < until:
+            events |= game.step(self.player_input(game.tick - start))
+        return events
+
+    # --------------- File Format ---------------
+    def to_bytes(self):
+        difficulty = self.difficulty
+        header = HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, self.flags, self.tick_rate, self.seed,
+            difficulty.max_error, difficulty.min_error, difficulty.speed_factor,
+            self.winning_score, self.tick_count, self.keyframe_interval, len(self.keyframes),
+        )
+        return header + b"".join(self.keyframes) + zlib.compress(bytes(self.inputs), 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Parses a replay. Raises ValueError if data is not a valid replay.
+        """
+        try:
+            return cls._parse(data)
+        except (struct.error, zlib.error) as e:
+            raise ValueError(f"corrupt replay: {e}")
+
+    @classmethod
+    def _parse(cls, data):
+        (magic, version, flags, tick_rate, seed, max_error, min_error, speed_factor,
+         winning_score, tick_count, keyframe_interval, keyframe_count) = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a PyPong replay, or from an unsupported version")
+        replay = cls(
+            seed=seed,
+            tick_rate=tick_rate,
+            difficulty=pong_core.Difficulty(max_error, min_error, speed_factor),
+            winning_score=winning_score,
+            flags=flags,
+            keyframe_interval=keyframe_interval,
+        )
+        offset = HEADER.size
+        for _ in range(keyframe_count):
+            keyframe = data[offset:offset + KEYFRAME.size]
+            replay.keyframe_ticks.append(KEYFRAME.unpack_from(keyframe)[0])
+            replay.keyframes.append(keyframe)
+            offset += KEYFRAME.size
+        replay.inputs = bytearray(zlib.decompress(data[offset:]))
+        replay.tick_count = tick_count
+        return replay
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def verify(self):
+        """
+        Replays the whole recording from its first keyframe and checks that
+        it passes through every other keyframe exactly. Returns the ticks of
+        the keyframes that did not match.
+        """
+        game = self.new_game()
+        mismatches = []
+        for tick, keyframe in zip(self.keyframe_ticks[1:], self.keyframes[1:]):
+            self.play(game, tick)
+            if game.snapshot() != keyframe:
+                mismatches.append(tick)
+                game.restore(keyframe)
+        return mismatches
+
+# --------------- Command Line ---------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize and replay a PyPong replay file.")
+    parser.add_argument("filename")
+    parser.add_argument("--seek", type=int, help="Also time a seek to this tick.")
+    parser.add_argument("--verify", action="store_true", help="Check that the replay reproduces its keyframes.")
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.filename)
+    size = len(replay.to_bytes())
+    seconds = replay.tick_count / replay.tick_rate
+    print(f"{args.filename}: {size:,} bytes, {replay.tick_count:,} ticks ({seconds:.1f} s at {replay.tick_rate} ticks/s), {len(replay.keyframes)} keyframes")
+
+    game = replay.new_game()
+    t0 = time.perf_counter()
+    replay.play(game)
+    elapsed = time.perf_counter() - t0
+    speed = seconds / elapsed if elapsed > 0 else float("inf")
+    print(f"Final score {game.player_score} - {game.cpu_score}, winner: {game.winner()}")
+    print(f"Played back in {elapsed * 1000:.1f} ms ({speed:,.0f}x real time)")
+
+    if args.seek is not None:
+        game = replay.new_game()
+        t0 = time.perf_counter()
+        tick = replay.seek(game, args.seek)
+        print(f"Seek to tick {tick:,} took {(time.perf_counter() - t0) * 1000:.2f} ms; score {game.player_score} - {game.cpu_score}")
+    if args.verify:
+        mismatches = replay.verify()
+        if mismatches:
+            print(f"Desynced at keyframe ticks: {mismatches}")
+            return 1
+        print("Replay reproduces every keyframe.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
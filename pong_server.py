@@ -0,0 +1,353 @@
+"""
+Headless match server for PyPong: many matches on one machine.
+
+Matches (pong_core.GameCore instances) are sharded across worker
+processes, one per core by default. Each shard steps every match it owns
+in a single fixed-tick loop and reports, every METRICS_INTERVAL seconds,
+how many matches it has and how long its ticks took. The MatchServer in
+the parent process admits new matches to the least loaded shard, and turns
+them away once no shard could take one more without its ticks running
+over budget.
+
+    python pong_server.py loadtest --matches 20000 --seconds 10
+
+drives synthetic matches against a local server and reports matches per
+core and per-shard tick latency.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import pong_core
+from pong_core import TICK_RATE, INPUT_UP, INPUT_DOWN
+
+# --------------- Global Variables and Constants ---------------
+METRICS_INTERVAL = 0.25            # Seconds between shard metric reports.
+MAX_MATCHES_PER_SHARD = 20000      # Hard cap, whatever the measured tick cost.
+INITIAL_MATCHES_PER_SHARD = 500    # Cap until a shard has reported what a match costs it.
+ADMISSION_HEADROOM = 0.8           # Share of the tick budget a shard may be loaded to.
+MAX_CATCHUP_TICKS = 5              # Most ticks a late shard runs back to back before dropping time.
+
+# Commands sent to shards.
+CMD_CREATE = "create"
+CMD_INPUTS = "inputs"
+CMD_REMOVE = "remove"
+CMD_STOP   = "stop"
+
+# --------------- Shard Worker ---------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+def run_shard(shard_id, commands, results, tick_rate=TICK_RATE):
+    """
+    Worker process main loop: applies queued commands, steps every match
+    once per tick and reports finished matches and metrics to results.
+    """
+    matches = {}    # match id -> [game, input word (None: AI)]
+    tick_time = 1.0 / tick_rate
+    next_tick = time.perf_counter()
+    samples = []
+    overruns = 0
+    steps = 0
+    finished = []
+    report_at = next_tick + METRICS_INTERVAL
+    while True:
+        # Commands.
+        while True:
+            try:
+                command = commands.get_nowait()
+            except queue.Empty:
+                break
+            kind = command[0]
+            if kind == CMD_CREATE:
+                _, match_id, seed, difficulty, bot = command
+                game = pong_core.GameCore(seed=seed, tick_rate=tick_rate, difficulty=difficulty)
+                matches[match_id] = [game, None if bot else 0]
+            elif kind == CMD_INPUTS:
+                for match_id, word in command[1]:
+                    match = matches.get(match_id)
+                    if match is not None:
+                        match[1] = word
+            elif kind == CMD_REMOVE:
+                matches.pop(command[1], None)
+            elif kind == CMD_STOP:
+                return
+
+        # One tick of every match.
+        start = time.perf_counter()
+        done = []
+        for match_id, match in matches.items():
+            game = match[0]
+            game.step(match[1])
+            if game.winner() is not None:
+                done.append((match_id, game.player_score, game.cpu_score, game.tick))
+        steps += len(matches)
+        for result in done:
+            del matches[result[0]]
+        finished.extend(done)
+        end = time.perf_counter()
+        samples.append(end - start)
+
+        if end >= report_at:
+            samples.sort()
+            results.put((shard_id, {
+                "matches": len(matches),
+                "ticks": len(samples),
+                "match_ticks": steps,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "max_ms": samples[-1] * 1000,
+                "overruns": overruns,
+                "interval": end - report_at + METRICS_INTERVAL,
+            }, finished))
+            samples = []
+            finished = []
+            steps = 0
+            overruns = 0
+            report_at = end + METRICS_INTERVAL
+        elif finished:
+            results.put((shard_id, None, finished))
+            finished = []
+
+        next_tick += tick_time
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            overruns += 1
+            if -delay > tick_time * MAX_CATCHUP_TICKS:
+                next_tick = time.perf_counter()  # Too far behind: drop the backlog.
+
+# --------------- Match Server ---------------
+class Shard:
+    """
+    The parent's handle on one worker process.
+    """
+    def __init__(self, shard_id, results, tick_rate):
+        self.shard_id = shard_id
+        self.commands = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=run_shard, args=(shard_id, self.commands, results, tick_rate),
+            name=f"pong-shard-{shard_id}", daemon=True,
+        )
+        self.process.start()
+        self.matches = 0        # Matches assigned and not yet finished.
+        self.metrics = None     # Latest report from the worker.
+        self.pending_inputs = []
+
+class MatchServer:
+    """
+    Shards matches across worker processes.
+    create_match() admits a match to the least loaded shard, or returns None
+    if every shard is full. Call poll() regularly: it collects metrics and
+    returns the matches that finished since the last call.
+    """
+    def __init__(self, shards=None, tick_rate=TICK_RATE, max_matches_per_shard=MAX_MATCHES_PER_SHARD,
+                 initial_matches_per_shard=INITIAL_MATCHES_PER_SHARD):
+        self.tick_rate = tick_rate
+        self.tick_budget_ms = 1000.0 / tick_rate
+        self.max_matches_per_shard = max_matches_per_shard
+        self.initial_matches_per_shard = initial_matches_per_shard
+        self.results = multiprocessing.Queue()
+        self.shards = [Shard(i, self.results, tick_rate) for i in range(shards or os.cpu_count() or 1)]
+        self.match_shards = {}
+        self.next_id = 1
+        self.rejected = 0
+
+    def can_admit(self, shard):
+        """
+        True if the shard can take one more match and still finish its
+        ticks within ADMISSION_HEADROOM of the tick budget, judging by the
+        per-match cost of its last reported ticks. Until a shard has
+        reported ticks with matches in them, it takes at most
+        initial_matches_per_shard.
+        """
+        if shard.matches >= self.max_matches_per_shard:
+            return False
+        metrics = shard.metrics
+        if metrics is None or not metrics["matches"]:
+            return shard.matches < self.initial_matches_per_shard
+        per_match_ms = metrics["p99_ms"] / metrics["matches"]
+        return per_match_ms * (shard.matches + 1) <= self.tick_budget_ms * ADMISSION_HEADROOM
+
+    def create_match(self, seed=None, difficulty="normal", bot=True):
+        """
+        Starts a match and returns its id, or None if no shard can take it.
+        bot matches have both paddles played by the AI; otherwise the left
+        paddle follows send_input().
+        """
+        shard = min(self.shards, key=lambda s: s.matches)
+        if not self.can_admit(shard):
+            self.rejected += 1
+            return None
+        match_id = self.next_id
+        self.next_id += 1
+        shard.commands.put((CMD_CREATE, match_id, seed, difficulty, bot))
+        shard.matches += 1
+        self.match_shards[match_id] = shard
+        return match_id
+
+    def send_input(self, match_id, input_word):
+        """
+        Sets the input word a match's left paddle holds from its next tick.
+        Inputs are batched per shard until flush().
+        """
+        shard = self.match_shards.get(match_id)
+        if shard is not None:
+            shard.pending_inputs.append((match_id, input_word))
+
+    def flush(self):
+        for shard in self.shards:
+            if shard.pending_inputs:
+                shard.commands.put((CMD_INPUTS, shard.pending_inputs))
+                shard.pending_inputs = []
+
+    def remove_match(self, match_id):
+        shard = self.match_shards.pop(match_id, None)
+        if shard is not None:
+            shard.commands.put((CMD_REMOVE, match_id))
+            shard.matches -= 1
+
+    def poll(self):
+        """
+        Sends batched inputs, collects shard reports and returns
+        (match id, player score, cpu score, ticks) for every match that
+        finished since the last call.
+        """
+        self.flush()
+        finished = []
+        while True:
+            try:
+                shard_id, metrics, done = self.results.get_nowait()
+            except queue.Empty:
+                break
+            shard = self.shards[shard_id]
+            if metrics is not None:
+                shard.metrics = metrics
+            for result in done:
+                if self.match_shards.pop(result[0], None) is not None:
+                    shard.matches -= 1
+                    finished.append(result)
+        return finished
+
+    def metrics(self):
+        """
+        Returns the latest report of every shard, with the shard's assigned
+        match count and its throughput in match ticks per second.
+        """
+        rows = []
+        for shard in self.shards:
+            row = dict(shard.metrics or {})
+            row["shard"] = shard.shard_id
+            row["assigned"] = shard.matches
+            if row.get("interval"):
+                row["match_ticks_per_s"] = row["match_ticks"] / row["interval"]
+            rows.append(row)
+        return rows
+
+    def close(self):
+        for shard in self.shards:
+            shard.commands.put((CMD_STOP,))
+        for shard in self.shards:
+            shard.process.join(timeout=2)
+            if shard.process.is_alive():
+                shard.process.terminate()
+
+# --------------- Load Test ---------------
+def format_metrics(rows, budget_ms):
+    lines = []
+    for row in rows:
+        if "p99_ms" not in row:
+            lines.append(f"  shard {row['shard']}: {row['assigned']} matches, no report yet")
+            continue
+        lines.append(
+            f"  shard {row['shard']}: {row['matches']:>6} matches  tick p50 {row['p50_ms']:6.2f} ms  "
+            f"p99 {row['p99_ms']:6.2f} ms  max {row['max_ms']:6.2f} ms (budget {budget_ms:.1f})  "
+            f"overruns {row['overruns']:>3}  {row.get('match_ticks_per_s', 0):>10,.0f} match ticks/s"
+        )
+    return "\n".join(lines)
+
+def load_test(matches=10000, seconds=10.0, shards=None, ramp=3.0, human_fraction=0.1, seed=1):
+    """
+    Keeps up to `matches` synthetic matches running against a local
+    MatchServer for `seconds`, ramping up over `ramp` seconds and replacing
+    matches as they finish. A human_fraction of them take scripted inputs
+    through send_input(); the rest are AI against AI. Returns a report.
+    """
+    server = MatchServer(shards)
+    rng = pong_core.Rng(seed)
+    live = set()
+    humans = set()
+    finished = 0
+    start = time.perf_counter()
+    last_print = start
+    try:
+        while True:
+            now = time.perf_counter()
+            elapsed = now - start
+            if elapsed >= seconds:
+                break
+            for result in server.poll():
+                live.discard(result[0])
+                humans.discard(result[0])
+                finished += 1
+            target = int(matches * min(1.0, elapsed / ramp)) if ramp else matches
+            while len(live) < target:
+                human = len(humans) < (len(live) + 1) * human_fraction
+                match_id = server.create_match(seed=rng.next_u64(), bot=not human)
+                if match_id is None:
+                    break
+                live.add(match_id)
+                if human:
+                    humans.add(match_id)
+            for match_id in humans:
+                if rng.random() < 0.2:
+                    server.send_input(match_id, (0, INPUT_UP, INPUT_DOWN)[int(rng.random() * 3)])
+            if now - last_print >= 1.0:
+                last_print = now
+                print(f"[{elapsed:5.1f} s] {len(live)} live matches, {finished} finished, {server.rejected} admissions refused")
+                print(format_metrics(server.metrics(), server.tick_budget_ms), flush=True)
+            time.sleep(0.02)
+        rows = server.metrics()
+    finally:
+        server.close()
+    reported = [row for row in rows if "p99_ms" in row]
+    return {
+        "shards": len(server.shards),
+        "live": len(live),
+        "finished": finished,
+        "rejected": server.rejected,
+        "matches_per_core": len(live) / len(server.shards),
+        "match_ticks_per_s": sum(row.get("match_ticks_per_s", 0) for row in reported),
+        "worst_p99_ms": max((row["p99_ms"] for row in reported), default=0.0),
+        "tick_budget_ms": server.tick_budget_ms,
+        "shard_metrics": rows,
+    }
+
+# --------------- Command Line ---------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyPong headless match server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    test = commands.add_parser("loadtest", help="Drive synthetic matches against a local server.")
+    test.add_argument("--matches", type=int, default=10000, help="Concurrent matches to aim for.")
+    test.add_argument("--seconds", type=float, default=10.0)
+    test.add_argument("--shards", type=int, default=None, help="Worker processes (default: one per core).")
+    test.add_argument("--ramp", type=float, default=3.0, help="Seconds to ramp up to --matches.")
+    test.add_argument("--human-fraction", type=float, default=0.1, help="Share of matches fed scripted inputs.")
+    args = parser.parse_args(argv)
+
+    report = load_test(args.matches, args.seconds, args.shards, args.ramp, args.human_fraction)
+    print()
+    print(f"{report['live']} concurrent matches on {report['shards']} shards: "
+          f"{report['matches_per_core']:,.0f} matches per core, {report['match_ticks_per_s']:,.0f} match ticks/s")
+    print(f"Worst shard p99 tick {report['worst_p99_ms']:.2f} ms of a {report['tick_budget_ms']:.1f} ms budget; "
+          f"{report['finished']} matches finished, {report['rejected']} admissions refused")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())